@@ -22,17 +22,24 @@ def main():
 
     if not args.apply:
         # Dry-run: report how many rows would change
-        # Count rows where name differs from mapping
-        changed = 0
+        # Count rows where name differs from mapping in a single join
+        # against a temp table instead of one COUNT per product
         import sqlite3
         with sqlite3.connect(args.history_db) as conn:
-            for url, name in name_map.items():
-                cur = conn.execute(
-                    "SELECT COUNT(1) FROM price_history WHERE product_url = ? AND product_name <> ?",
-                    (url, name),
-                )
-                (cnt,) = cur.fetchone()
-                changed += cnt or 0
+            conn.execute(
+                "CREATE TEMP TABLE name_map (url TEXT PRIMARY KEY, name TEXT) WITHOUT ROWID"
+            )
+            conn.executemany("INSERT INTO name_map VALUES (?, ?)", name_map.items())
+            cur = conn.execute(
+                """
+                SELECT COUNT(1)
+                FROM price_history ph
+                JOIN name_map m ON ph.product_url = m.url
+                WHERE ph.product_name <> m.name
+                """
+            )
+            (cnt,) = cur.fetchone()
+            changed = cnt or 0
         print(f"[DRY-RUN] Rows requiring update: {changed}")
         print("Use --apply to perform the update.")
         return
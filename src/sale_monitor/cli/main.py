@@ -3,133 +3,243 @@
 Sale Monitor CLI - Command-line interface for the Sale Monitor application.
 """
 import argparse
+import functools
 import logging
 import os
-import time
-from datetime import datetime, timedelta
+import re
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
 
 import schedule
 from dotenv import load_dotenv
 
-from sale_monitor.services.price_extractor import PriceExtractor
+from sale_monitor.services.price_extractor import PriceExtractor, extract_price_from_html
 from sale_monitor.storage.csv_products import read_products
-from sale_monitor.storage.json_state import load_state, save_state
+from sale_monitor.storage.json_state import load_state, save_state_incremental
 from sale_monitor.storage.price_history import PriceHistory
+from sale_monitor.storage.sqlite_state import SQLiteStateStore
 from sale_monitor.services.notifications import NotificationManager, SmtpConfig
 
 
+# Interval such as '15m', '1h' or '30s'
+_INTERVAL_RE = re.compile(r"^(\d+)([smh])$")
+_INTERVAL_UNITS = {"s": "second", "m": "minute", "h": "hour"}
+
+
 def _str_to_bool(v: str, default: bool = False) -> bool:
     if v is None:
         return default
     return str(v).strip().lower() in ("1", "true", "yes", "y", "on")
 
 
-def check_prices(args, smtp_cfg, notifier, extractor, history=None):
-    """Check prices for all products - extracted for scheduling."""
+def _fetch_prices(extractor, products, max_workers, parse_processes=0):
+    """Fetch prices for products concurrently, preserving input order.
+
+    With parse_processes > 0, pages are downloaded on the thread pool and
+    parsed in a process pool so HTML parsing is not serialized by the GIL.
+    """
+    if parse_processes > 0 and products:
+        return _fetch_then_parse(extractor, products, max_workers, parse_processes)
+    return extractor.extract_prices_bulk([(p.url, p.selector) for p in products], max_workers)
+
+
+def _fetch_then_parse(extractor, products, max_workers, parse_processes):
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(products)))) as pool:
+        pages = list(pool.map(lambda p: extractor.fetch_html(p.url), products))
+
+    results = [(None, "")] * len(products)
+    fetched = [i for i, html in enumerate(pages) if html is not None]
+    if fetched:
+        # Only plain strings cross the process boundary
+        with ProcessPoolExecutor(max_workers=min(parse_processes, len(fetched))) as pool:
+            parsed = pool.map(
+                extract_price_from_html,
+                [pages[i] for i in fetched],
+                [products[i].selector for i in fetched],
+                [products[i].url for i in fetched],
+            )
+            for i, result in zip(fetched, parsed):
+                results[i] = result
+    return results
+
+
+def _is_in_cooldown(now_ts, last_sent_ts, cooldown_hours, mode="rolling"):
+    """Whether a notification sent at last_sent_ts (epoch seconds) still blocks one at now_ts.
+
+    In 'rolling' mode the window is exactly cooldown_hours from the last
+    send; the check interval is not added to it. In 'calendar_day' mode it
+    lasts until cooldown_hours/24 (at least one) UTC dates have turned over,
+    so a daily alert isn't skipped when checks drift a few minutes early.
+    """
+    if last_sent_ts is None:
+        return False
+    if mode == "calendar_day":
+        days = max(1, round(cooldown_hours / 24))
+        return now_ts // 86400 - last_sent_ts // 86400 < days
+    return now_ts - last_sent_ts < cooldown_hours * 3600
+
+
+def check_prices(args, smtp_cfg, notifier, extractor, history=None, state_store=None):
+    """Check prices for all products - extracted for scheduling.
+
+    State is kept in state_store when given, otherwise in args.state_file.
+    """
     products = read_products(args.products_csv)
-    state = load_state(args.state_file)
-
-    enabled = [p for p in products if p.enabled]
-    logging.info(f"Checking {len(enabled)} enabled products from {args.products_csv}")
+    if state_store is not None:
+        state = state_store.load()
+    else:
+        state = load_state(args.state_file)
+
+    # Group by host so consecutive fetches reuse pooled keep-alive connections
+    enabled = sorted((p for p in products if p.enabled), key=lambda p: urlsplit(p.url).netloc)
+    logging.info("Checking %d enabled products from %s", len(enabled), args.products_csv)
+
+    # ETags saved by earlier runs let unchanged pages answer 304 (no body to
+    # download or parse); the stored price is reused for those. fetch_html
+    # (the parse-process path) is unconditional and records no ETag, so
+    # ETags are neither used nor kept there.
+    use_etags = args.parse_processes <= 0
+    for p in enabled if use_etags else ():
+        rec = state.get(p.url)
+        if rec and rec.get("etag") and rec.get("current_price") is not None and rec.get("selector") == p.selector:
+            extractor.remember_etag(
+                p.url, rec["etag"], p.selector, (rec["current_price"], rec.get("selector_source") or "")
+            )
+
+    # Fetches are network-bound, so overlap them; state/notification
+    # bookkeeping below stays sequential
+    results = _fetch_prices(extractor, enabled, args.max_workers, args.parse_processes)
+
+    # Every page is fetched by now, so one timestamp describes the whole run
+    now_dt = datetime.now()
+    now = now_dt.isoformat()
+    now_ts = now_dt.timestamp()
 
     updated = 0
-    for p in enabled:
-        price, selector_source = extractor.extract_price(p.url, p.selector)
-        if price is None:
-            logging.warning(f"{p.name}: price not found")
-            continue
+    changed = {}
+    history_rows = []
+    try:
+        for p, (price, selector_source) in zip(enabled, results):
+            if price is None:
+                logging.warning("%s: price not found", p.name)
+                continue
         
-        # Record price in history
-        if history:
-            history.record_price(p.url, p.name, price)
-
-        now = datetime.now().isoformat()
-        key = p.url  # Use URL as stable key
-        rec = state.get(key, {})
-        old_price = rec.get("current_price")
-
-        # Persist price check
-        rec.update({
-            "name": p.name,
-            "url": p.url,
-            "selector": p.selector,
-            "selector_source": selector_source,  # Track how selector was determined
-            "current_price": price,
-            "last_checked": now,
-            "last_price": old_price,
-        })
-
-        # Log price change
-        if old_price is None:
-            logging.info(f"{p.name}: ${price:.2f}")
-        elif price != old_price:
-            logging.info(f"{p.name}: ${price:.2f} (was ${old_price:.2f})")
-        else:
-            logging.info(f"{p.name}: ${price:.2f} (no change)")
-
-        # Determine if we should notify
-        should_notify = False
-        triggered_by = None
-
-        # Target price trigger
-        if p.target_price is not None and price <= p.target_price:
-            should_notify = True
-            triggered_by = "target_price"
-
-        # Discount threshold trigger (requires a prior price)
-        if not should_notify and p.discount_threshold is not None and old_price is not None:
-            try:
-                threshold_price = float(old_price) * (1 - float(p.discount_threshold) / 100.0)
-                if price <= threshold_price:
-                    should_notify = True
-                    triggered_by = f"discount_{p.discount_threshold:.0f}%"
-            except Exception:
-                pass
-
-        # Cooldown and de-dup checks
-        if should_notify and smtp_cfg.enable:
-            cooldown_hours = p.notification_cooldown_hours or args.default_cooldown_hours
-            last_sent_str = rec.get("last_notification_sent")
-            last_sent = None
-            if last_sent_str:
-                try:
-                    last_sent = datetime.fromisoformat(last_sent_str)
-                except Exception:
-                    last_sent = None
+            # Queue price for history; written in one transaction after the loop
+            history_rows.append((p.url, p.name, price))
+
+            key = p.url  # Use URL as stable key
+            rec = state.get(key, {})
+            old_price = rec.get("current_price")
+
+            # Persist price check
+            rec.update({
+                "name": p.name,
+                "url": p.url,
+                "selector": p.selector,
+                "selector_source": selector_source,  # Track how selector was determined
+                "current_price": price,
+                "last_checked": now,
+                "last_price": old_price,
+                "etag": extractor.etag_for(p.url) if use_etags else None,
+            })
+            state[key] = rec
+            changed[key] = rec
+            updated += 1
+
+            # Log price change
+            if old_price is None:
+                logging.info("%s: $%.2f", p.name, price)
+            elif price != old_price:
+                logging.info("%s: $%.2f (was $%.2f)", p.name, price, old_price)
+            else:
+                logging.info("%s: $%.2f (no change)", p.name, price)
 
-            in_cooldown = False
-            if last_sent:
-                in_cooldown = datetime.now() < (last_sent + timedelta(hours=cooldown_hours))
+            # No notification rules configured for this product
+            if p.target_price is None and p.discount_threshold is None:
+                continue
 
-            last_notified_price = rec.get("last_notification_price")
+            # Determine if we should notify
+            should_notify = False
+            triggered_by = None
 
-            # Suppress only if within cooldown AND price hasn't changed
-            if in_cooldown and last_notified_price is not None and float(last_notified_price) == float(price):
-                # Within cooldown and same price as last notification -> skip
-                logging.info(f"{p.name}: notification suppressed (cooldown, same price)")
-                pass
-            else:
-                # Send email
+            # Target price trigger
+            if p.target_price is not None and price <= p.target_price:
+                should_notify = True
+                triggered_by = "target_price"
+
+            # Discount threshold trigger (requires a prior price)
+            if not should_notify and p.discount_threshold is not None and old_price is not None:
                 try:
-                    notifier.send_sale_notification(
-                        product_name=p.name,
-                        product_url=p.url,
-                        current_price=price,
-                        old_price=old_price,
-                        target_price=p.target_price,
-                        triggered_by=triggered_by or "rule",
-                    )
-                    rec["last_notification_sent"] = datetime.now().isoformat()
-                    rec["last_notification_price"] = price
-                    logging.info(f"{p.name}: notification sent")
-                except Exception as e:
-                    logging.error(f"{p.name}: email failed: {e}")
-
-        state[key] = rec
-        updated += 1
-
-    save_state(args.state_file, state)
-    logging.info(f"Updated {updated} products. State saved to {args.state_file}.")
+                    threshold_price = float(old_price) * (1 - float(p.discount_threshold) / 100.0)
+                    if price <= threshold_price:
+                        should_notify = True
+                        triggered_by = f"discount_{p.discount_threshold:.0f}%"
+                except Exception:
+                    pass
+
+            # Cooldown and de-dup checks
+            if should_notify and smtp_cfg.enable:
+                cooldown_hours = p.notification_cooldown_hours or args.default_cooldown_hours
+                last_sent_ts = rec.get("last_notification_sent_ts")
+                if last_sent_ts is None and rec.get("last_notification_sent"):
+                    # Records written before the epoch timestamp was stored
+                    try:
+                        last_sent_ts = datetime.fromisoformat(rec["last_notification_sent"]).timestamp()
+                    except (TypeError, ValueError):
+                        last_sent_ts = None
+                    else:
+                        # Saved with the record, so later runs skip the parse
+                        rec["last_notification_sent_ts"] = last_sent_ts
+
+                if last_sent_ts is not None and last_sent_ts > now_ts:
+                    # Stamped by a clock ahead of ours; count it as sent now so the
+                    # cooldown ends cooldown_hours from here, not from the future
+                    logging.warning("%s: last notification time is in the future; clamping to now", p.name)
+                    last_sent_ts = rec["last_notification_sent_ts"] = now_ts
+
+                in_cooldown = _is_in_cooldown(now_ts, last_sent_ts, cooldown_hours, p.cooldown_mode)
+
+                last_notified_price = rec.get("last_notification_price")
+
+                # Suppress only if within cooldown AND price hasn't changed
+                if in_cooldown and last_notified_price is not None and float(last_notified_price) == float(price):
+                    # Within cooldown and same price as last notification -> skip
+                    logging.info("%s: notification suppressed (cooldown, same price)", p.name)
+                    pass
+                else:
+                    # Send email
+                    try:
+                        notifier.send_sale_notification(
+                            product_name=p.name,
+                            product_url=p.url,
+                            current_price=price,
+                            old_price=old_price,
+                            target_price=p.target_price,
+                            triggered_by=triggered_by or "rule",
+                        )
+                        rec["last_notification_sent"] = now
+                        rec["last_notification_sent_ts"] = now_ts
+                        rec["last_notification_price"] = price
+                        logging.info("%s: notification sent", p.name)
+                    except Exception as e:
+                        logging.error("%s: email failed: %s", p.name, e)
+    finally:
+        # End the SMTP session opened for this batch of alerts, even if the
+        # loop raised; the notifier is reused by later scheduled runs
+        notifier.close()
+
+    if history and history_rows:
+        history.record_prices_bulk(history_rows)
+
+    if state_store is not None:
+        state_store.save(changed)
+        logging.info("Updated %d products. State saved to %s.", updated, args.history_db)
+    else:
+        save_state_incremental(args.state_file, changed)
+        logging.info("Updated %d products. State saved to %s.", updated, args.state_file)
     return updated
 
 
@@ -139,11 +249,18 @@ def main() -> int:
     parser = argparse.ArgumentParser(description="Sale Monitor - CSV-backed")
     parser.add_argument("--products-csv", default=os.getenv("PRODUCTS_CSV", "data/products.csv"))
     parser.add_argument("--state-file", default=os.getenv("STATE_FILE", "data/state.json"))
+    parser.add_argument("--state-backend", choices=("json", "sqlite"),
+                       default=os.getenv("STATE_BACKEND", "json"),
+                       help="Where to keep per-product state: state file (json) or history DB (sqlite)")
     parser.add_argument("--history-db", default=os.getenv("HISTORY_DB", "data/history.db"))
     parser.add_argument("--history-retention-days", type=int, default=int(os.getenv("HISTORY_RETENTION_DAYS", "90")))
     parser.add_argument("--user-agent", default=os.getenv("USER_AGENT", "Mozilla/5.0 (compatible; SaleMonitor/1.0)"))
     parser.add_argument("--timeout", type=int, default=int(os.getenv("TIMEOUT", "30")))
     parser.add_argument("--max-retries", type=int, default=int(os.getenv("MAX_RETRIES", "3")))
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("MAX_WORKERS", "8")),
+                       help="Number of products to fetch concurrently (1 = sequential)")
+    parser.add_argument("--parse-processes", type=int, default=int(os.getenv("PARSE_PROCESSES", "0")),
+                       help="Parse fetched pages in this many worker processes (0 = parse in fetch threads)")
     parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "INFO"))
     parser.add_argument("--default-cooldown-hours", type=int, default=int(os.getenv("NOTIFICATION_COOLDOWN_HOURS", "24")))
     parser.add_argument("--every", default=os.getenv("CHECK_INTERVAL", ""), 
@@ -253,44 +370,49 @@ def main() -> int:
     if args.history_retention_days > 0:
         deleted = history.cleanup_old_records(args.history_retention_days)
         if deleted:
-            logging.info(f"Cleaned up {deleted} old history records (retention: {args.history_retention_days} days)")
+            logging.info("Cleaned up %d old history records (retention: %d days)", deleted, args.history_retention_days)
 
-    # One-time run or scheduled?
-    if not args.every:
-        # One-time check
-        check_prices(args, smtp_cfg, notifier, extractor, history)
-        return 0
+    # Opened once and shared by every scheduled run
+    state_store = None
+    if args.state_backend == "sqlite":
+        state_store = SQLiteStateStore(args.history_db, import_from=args.state_file)
 
-    # Parse interval
-    interval = args.every.strip().lower()
-    if interval.endswith('m'):
-        minutes = int(interval[:-1])
-        schedule.every(minutes).minutes.do(lambda: check_prices(args, smtp_cfg, notifier, extractor, history))
-        logging.info(f"Scheduler started: checking every {minutes} minute(s)")
-    elif interval.endswith('h'):
-        hours = int(interval[:-1])
-        schedule.every(hours).hours.do(lambda: check_prices(args, smtp_cfg, notifier, extractor, history))
-        logging.info(f"Scheduler started: checking every {hours} hour(s)")
-    elif interval.endswith('s'):
-        seconds = int(interval[:-1])
-        schedule.every(seconds).seconds.do(lambda: check_prices(args, smtp_cfg, notifier, extractor, history))
-        logging.info(f"Scheduler started: checking every {seconds} second(s)")
-    else:
-        logging.error(f"Invalid interval format: {interval}. Use format like '15m', '1h', '30s'")
-        return 1
+    try:
+        # One-time run or scheduled?
+        if not args.every:
+            # One-time check
+            check_prices(args, smtp_cfg, notifier, extractor, history, state_store)
+            return 0
 
-    # Run once immediately, then on schedule
-    check_prices(args, smtp_cfg, notifier, extractor, history)
+        # Parse interval
+        interval = args.every.strip().lower()
+        match = _INTERVAL_RE.match(interval)
+        if not match:
+            logging.error("Invalid interval format: %s. Use format like '15m', '1h', '30s'", interval)
+            return 1
+        count, unit = int(match[1]), _INTERVAL_UNITS[match[2]]
+        job = functools.partial(check_prices, args, smtp_cfg, notifier, extractor, history, state_store)
+        getattr(schedule.every(count), f"{unit}s").do(job)
+        logging.info("Scheduler started: checking every %d %s(s)", count, unit)
 
-    try:
-        while True:
+        # Run once immediately, then on schedule
+        job()
+
+        # Sleep until the next job is due; SIGINT/SIGTERM wake the loop immediately
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+
+        while not stop.is_set():
             schedule.run_pending()
-            time.sleep(1)
-    except KeyboardInterrupt:
+            delay = schedule.idle_seconds()
+            stop.wait(timeout=max(0.05, min(delay if delay is not None else 60, 60)))
+
         logging.info("Scheduler stopped by user")
         return 0
-
-    return 0
+    finally:
+        if state_store is not None:
+            state_store.close()
 
 
 if __name__ == "__main__":
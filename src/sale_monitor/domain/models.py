@@ -2,9 +2,12 @@ from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Product:
-    """Represents a product to monitor."""
+    """Represents a product to monitor.
+
+    Immutable; use dataclasses.replace() to derive an updated product.
+    """
     name: str
     url: str
     selector: str
@@ -14,5 +17,6 @@ class Product:
     notification_cooldown_hours: int = 24
     current_price: Optional[float] = None
     selector_source: Optional[str] = None  # 'manual', 'auto', 'bookmarklet'
+    cooldown_mode: str = "rolling"  # 'rolling' or 'calendar_day'
 
 # Additional models can be defined here as needed for future expansion.
\ No newline at end of file
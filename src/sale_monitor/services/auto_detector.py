@@ -1,9 +1,26 @@
 """
 Auto-detection of price selectors for common e-commerce platforms.
 """
+import hashlib
 import re
-from typing import Optional, List, Tuple
-from bs4 import BeautifulSoup
+from typing import Dict, Optional, List, Tuple, Union
+
+from sale_monitor.services.html_page import HtmlPage
+
+_DIGIT_RE = re.compile(r'\d')
+_PRICE_INDICATOR_RE = re.compile(r'[$€£¥]|USD|EUR|GBP|CAD|AUD')
+_NON_PRICE_CHARS_RE = re.compile(r'[^\d.,]')
+
+
+def _scan_order(patterns: List[Tuple[str, str, float]]) -> List[Tuple[str, str, float]]:
+    """Sort patterns by descending confidence, keeping the best entry per selector."""
+    seen = set()
+    order = []
+    for entry in sorted(patterns, key=lambda t: -t[2]):
+        if entry[0] not in seen:
+            seen.add(entry[0])
+            order.append(entry)
+    return order
 
 
 class PriceAutoDetector:
@@ -46,49 +63,57 @@ class PriceAutoDetector:
         ('.price', 'generic', 0.60),
         ('#price', 'generic', 0.60),
     ]
+
+    # Scan order: highest confidence first (stable, so list order breaks ties).
+    # The first valid hit is then the overall best match.
+    _SCAN_ORDER: List[Tuple[str, str, float]] = _scan_order(PATTERNS)
+    
+    # Maximum number of memoized detection results (cleared when exceeded)
+    CACHE_SIZE = 256
     
     def __init__(self):
         self.last_detected_platform: Optional[str] = None
         self.last_detected_selector: Optional[str] = None
         self.last_confidence: Optional[float] = None
+        # HTML digest -> detection result; unchanged pages skip the selector scan
+        self._cache: Dict[bytes, Tuple[str, str, float]] = {}
     
-    def detect_price(self, html: str) -> Tuple[str, str, float]:
+    def detect_price(self, html: Union[str, HtmlPage]) -> Tuple[str, str, float]:
         """
         Try to automatically detect the price selector from HTML.
         
         Args:
-            html: Raw HTML content of the product page
+            html: Raw HTML content of the product page, or an already parsed
+                HtmlPage to reuse its parse tree
             
         Returns:
             Tuple of (selector, platform, confidence) if found, or ('', '', 0.0) if not found
         """
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        best_match = None
-        best_confidence = 0.0
-        
-        for selector, platform, confidence in self.PATTERNS:
+        page = html if isinstance(html, HtmlPage) else HtmlPage(html)
+        key = hashlib.blake2b(page.html.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        result = self._cache.get(key)
+        if result is None:
+            result = self._detect(page)
+            if len(self._cache) >= self.CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = result
+        
+        if result[0]:
+            self.last_detected_selector, self.last_detected_platform, self.last_confidence = result
+        return result
+    
+    def _detect(self, page: HtmlPage) -> Tuple[str, str, float]:
+        """Scan the page with PATTERNS; returns ('', '', 0.0) if nothing matches."""
+        for selector, platform, confidence in self._SCAN_ORDER:
             try:
-                elements = soup.select(selector)
-                if elements:
-                    # Check if the element contains price-like text
-                    for elem in elements:
-                        text = elem.get_text(strip=True)
-                        if self._looks_like_price(text) and self._is_single_price(text):
-                            if confidence > best_confidence:
-                                best_match = (selector, platform, confidence)
-                                best_confidence = confidence
-                            break
+                # Check if the element contains price-like text
+                if any(self._looks_like_price(text) and self._is_single_price(text)
+                       for text in page.iter_texts(selector)):
+                    return (selector, platform, confidence)
             except Exception:
                 # Invalid selector or parsing error, skip
                 continue
         
-        if best_match:
-            self.last_detected_selector = best_match[0]
-            self.last_detected_platform = best_match[1]
-            self.last_confidence = best_match[2]
-            return best_match
-        
         # Return empty tuple instead of None
         return ('', '', 0.0)
     
@@ -102,21 +127,16 @@ class PriceAutoDetector:
         text = text.strip()
         
         # Must contain digits
-        if not any(c.isdigit() for c in text):
+        if not _DIGIT_RE.search(text):
             return False
         
         # Common price indicators
-        price_indicators = ['$', '€', '£', '¥', 'USD', 'EUR', 'GBP', 'CAD', 'AUD']
-        has_indicator = any(ind in text for ind in price_indicators)
-        
-        # Should be relatively short (prices aren't long paragraphs)
-        is_short = len(text) < 50
-        
-        # Contains decimal point or comma (common in prices)
-        has_decimal = '.' in text or ',' in text
+        if _PRICE_INDICATOR_RE.search(text):
+            return True
         
-        # Return True if it has price indicators or looks numeric enough
-        return has_indicator or (is_short and has_decimal)
+        # Otherwise it should be short (prices aren't long paragraphs) and
+        # contain a decimal point or comma (common in prices)
+        return len(text) < 50 and ('.' in text or ',' in text)
     
     @staticmethod
     def _is_single_price(text: str) -> bool:
@@ -135,8 +155,8 @@ class PriceAutoDetector:
             parts = text.split('$')
             if len(parts) == 3:  # Empty string before first $, then two price parts
                 # Extract just the numeric parts of each price
-                price1 = re.sub(r'[^\d.,]', '', parts[1])
-                price2 = re.sub(r'[^\d.,]', '', parts[2])
+                price1 = _NON_PRICE_CHARS_RE.sub('', parts[1])
+                price2 = _NON_PRICE_CHARS_RE.sub('', parts[2])
                 if price1 == price2:  # Duplicate prices like "$605.00$605.00"
                     return False
         
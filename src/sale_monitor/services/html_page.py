@@ -0,0 +1,75 @@
+"""
+Parsed HTML page with CSS selector queries.
+"""
+import re
+from typing import Any, Dict, Iterator, Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser, SelectolaxError
+except ImportError:  # Optional: fall back to BeautifulSoup for selector queries
+    LexborHTMLParser = None
+    SelectolaxError = None
+
+# Simple selectors the BeautifulSoup fallback answers with find_all instead
+# of the soupsieve engine: tag, .class, tag.class, #id, [attr], [attr="v"]
+_SIMPLE_SELECTOR_RE = re.compile(
+    r'^(?P<tag>[a-zA-Z][\w-]*)?'
+    r'(?:\.(?P<cls>[\w-]+)|#(?P<id>[\w-]+)|\[(?P<attr>[\w-]+)(?:="(?P<value>[^"]*)")?\])?$'
+)
+
+
+def _find_all_kwargs(selector: str) -> Optional[Dict[str, Any]]:
+    """find_all() arguments equivalent to a simple selector, or None if not simple."""
+    m = _SIMPLE_SELECTOR_RE.match(selector.strip())
+    if m is None or not any(m.groups()):
+        return None
+    tag, cls, id_, attr, value = m.group('tag', 'cls', 'id', 'attr', 'value')
+    if attr == 'class' and value is not None:
+        # bs4 matches class values per token; CSS [class="v"] is exact
+        return None
+    kwargs: Dict[str, Any] = {'name': tag.lower() if tag else True}
+    if cls is not None:
+        kwargs['class_'] = cls
+    elif id_ is not None:
+        kwargs['id'] = id_
+    elif attr is not None:
+        kwargs['attrs'] = {attr: True if value is None else value}
+    return kwargs
+
+
+class HtmlPage:
+    """Parsed page that answers CSS selector queries.
+
+    Uses lexbor (selectolax) when installed and falls back to BeautifulSoup
+    for selectors lexbor cannot parse (e.g. soupsieve extensions). Each
+    parser runs at most once per page.
+    """
+
+    def __init__(self, html: str):
+        self.html = html
+        self._tree = None
+        self._soup = None
+
+    def select_text(self, selector: str) -> Optional[str]:
+        """Return stripped text of the first element matching selector, or None."""
+        return next(self.iter_texts(selector), None)
+
+    def iter_texts(self, selector: str) -> Iterator[str]:
+        """Yield stripped text of each element matching selector, in document order."""
+        if LexborHTMLParser is not None:
+            if self._tree is None:
+                self._tree = LexborHTMLParser(self.html)
+            try:
+                nodes = self._tree.css(selector)
+            except SelectolaxError:
+                pass
+            else:
+                return (node.text(strip=True) for node in nodes)
+
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.html, "html.parser")
+        kwargs = _find_all_kwargs(selector)
+        elements = self._soup.find_all(**kwargs) if kwargs is not None else self._soup.select(selector)
+        return (el.get_text(strip=True) for el in elements)
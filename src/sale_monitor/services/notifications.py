@@ -1,8 +1,7 @@
 import smtplib
 import ssl
 from dataclasses import dataclass
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.message import EmailMessage
 from typing import Optional
 
 
@@ -21,6 +20,45 @@ class SmtpConfig:
 class NotificationManager:
     def __init__(self, config: SmtpConfig):
         self.config = config
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        # Kept open between messages so a batch of alerts pays for one
+        # connect/STARTTLS/login; close() ends the session
+        self._server: Optional[smtplib.SMTP] = None
+
+    def close(self) -> None:
+        """QUIT the open SMTP session, if any."""
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _connect(self) -> smtplib.SMTP:
+        if self._ssl_context is None:
+            self._ssl_context = ssl.create_default_context()
+        server = smtplib.SMTP(self.config.server, self.config.port, timeout=30)
+        try:
+            if self.config.use_starttls:
+                server.starttls(context=self._ssl_context)
+            server.login(self.config.username, self.config.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    def _send(self, msg_string: str) -> None:
+        if self._server is not None:
+            try:
+                self._server.sendmail(self.config.from_email, [self.config.to_email], msg_string)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Server closed the idle session; reconnect below
+                self._server = None
+
+        self._server = self._connect()
+        self._server.sendmail(self.config.from_email, [self.config.to_email], msg_string)
 
     def send_sale_notification(
         self,
@@ -49,16 +87,10 @@ class NotificationManager:
         lines.append(f"Trigger: {triggered_by}")
         body = "\n".join(lines)
 
-        msg = MIMEMultipart()
+        msg = EmailMessage()
         msg["From"] = self.config.from_email
         msg["To"] = self.config.to_email
         msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain"))
-
-        context = ssl.create_default_context()
+        msg.set_content(body)
 
-        with smtplib.SMTP(self.config.server, self.config.port, timeout=30) as server:
-            if self.config.use_starttls:
-                server.starttls(context=context)
-            server.login(self.config.username, self.config.password)
-            server.sendmail(self.config.from_email, [self.config.to_email], msg.as_string())
\ No newline at end of file
+        self._send(msg.as_string())
@@ -1,19 +1,37 @@
 import logging
 import re
+import threading
 import time
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 
 from sale_monitor.services.auto_detector import PriceAutoDetector
+from sale_monitor.services.html_page import HtmlPage
+
+# Everything except digits and decimal/thousands separators
+_NON_PRICE_CHARS_RE = re.compile(r"[^\d.,]")
+_SEPARATORS_RE = re.compile(r"[.,]")
 
 
 class PriceExtractor:
     """Handles price extraction from web pages."""
 
+    # Keep-alive pool sizing: number of hosts cached and connections per host.
+    # Sized above the CLI's concurrent fetch workers so threads don't block
+    # on, or discard, pooled connections.
+    POOL_CONNECTIONS = 32
+    POOL_MAXSIZE = 32
+
     def __init__(self, user_agent: str, timeout: int = 30, max_retries: int = 3):
         self.session = requests.Session()
+        # Retries are handled by extract_price (with backoff), not the adapter
+        adapter = HTTPAdapter(pool_connections=self.POOL_CONNECTIONS, pool_maxsize=self.POOL_MAXSIZE)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.session.headers.update({
             "User-Agent": user_agent,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -23,6 +41,9 @@ class PriceExtractor:
         self.timeout = timeout
         self.max_retries = max_retries
         self.auto_detector = PriceAutoDetector()
+        # url -> (ETag, selector, result); a 304 for the same selector reuses
+        # the result without downloading or parsing the page again
+        self._etag_cache: Dict[str, Tuple[str, str, Tuple[float, str]]] = {}
 
     def extract_price(self, url: str, selector: str = "") -> Tuple[Optional[float], str]:
         """Extract price from a webpage using CSS selector or auto-detection.
@@ -30,45 +51,22 @@ class PriceExtractor:
         Returns:
             Tuple of (price, selector_source) where selector_source is 'manual', 'auto', or empty string on failure
         """
+        cached = self._etag_cache.get(url)
+        etag = cached[0] if cached is not None and cached[1] == selector else None
+
         for attempt in range(self.max_retries):
             try:
-                resp = self.session.get(url, timeout=self.timeout)
-                if resp.status_code != 200:
-                    logging.warning("GET %s -> %s", url, resp.status_code)
-                    raise requests.RequestException(f"HTTP {resp.status_code}")
-                soup = BeautifulSoup(resp.text, "html.parser")
-                
-                # Try manual selector first if provided
-                if selector:
-                    el = soup.select_one(selector)
-                    if el:
-                        text = el.get_text(strip=True)
-                        price = self._parse_price(text)
-                        if price is not None:
-                            return price, 'manual'
-                        logging.warning("Failed to parse price from manual selector: %s", text)
+                resp = self._request(url, etag)
+                if resp.status_code == 304:
+                    return cached[2]
+                price, selector_source = extract_price_from_html(resp.text, selector, url, self.auto_detector)
+                if price is not None:
+                    new_etag = resp.headers.get("ETag")
+                    if new_etag:
+                        self._etag_cache[url] = (new_etag, selector, (price, selector_source))
                     else:
-                        logging.warning("Manual selector not found: %s on %s", selector, url)
-                
-                # Try auto-detection if manual failed or no selector provided
-                detected_selector, platform, confidence = self.auto_detector.detect_price(resp.text)
-                if detected_selector:
-                    el = soup.select_one(detected_selector)
-                    if el:
-                        text = el.get_text(strip=True)
-                        price = self._parse_price(text)
-                        if price is not None:
-                            logging.info("Auto-detected price on %s using %s selector (confidence: %.0f%%)", 
-                                       url, platform, confidence * 100)
-                            return price, 'auto'
-                        logging.warning("Auto-detected selector found but failed to parse price: %s", text)
-                    else:
-                        logging.warning("Auto-detected selector not found in soup: %s", detected_selector)
-                
-                # Both methods failed
-                logging.warning("Failed to extract price from %s (selector: %s, auto-detection: %s)", 
-                              url, selector or "none", "failed" if not detected_selector else "parse failed")
-                
+                        self._etag_cache.pop(url, None)
+                    return price, selector_source
             except requests.exceptions.RequestException as e:
                 logging.error("Request failed (attempt %d/%d): %s", attempt + 1, self.max_retries, e)
 
@@ -77,34 +75,161 @@ class PriceExtractor:
 
         return None, ""
 
+    def etag_for(self, url: str) -> Optional[str]:
+        """ETag of the last page a price was extracted from for url, if any."""
+        cached = self._etag_cache.get(url)
+        return cached[0] if cached is not None else None
+
+    def remember_etag(self, url: str, etag: str, selector: str, result: Tuple[float, str]) -> None:
+        """Seed the conditional-GET cache, e.g. from state saved by an earlier run.
+
+        A later extract_price(url, selector) sends If-None-Match and returns
+        result on 304 without downloading the page.
+        """
+        self._etag_cache[url] = (etag, selector, result)
+
+    def extract_prices_bulk(
+        self,
+        items: Iterable[Tuple[str, str]],
+        max_workers: int = 16,
+        max_per_host: Optional[int] = None,
+    ) -> List[Tuple[Optional[float], str]]:
+        """Extract prices for (url, selector) pairs concurrently over the shared session.
+
+        Args:
+            max_per_host: if set, at most this many requests run against any
+                one host at a time, so a store isn't hit by every worker at once
+
+        Results are in input order; an item that raises yields (None, "").
+        """
+        items = list(items)
+        if max_workers <= 1 or len(items) <= 1:
+            return [self._extract_price_logged(url, selector) for url, selector in items]
+
+        extract = self._extract_price_logged
+        if max_per_host:
+            # Built before any worker starts, so threads only ever read it
+            host_slots = {urlsplit(url).netloc: threading.BoundedSemaphore(max_per_host) for url, _ in items}
+
+            def extract(url: str, selector: str) -> Tuple[Optional[float], str]:
+                with host_slots[urlsplit(url).netloc]:
+                    return self._extract_price_logged(url, selector)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+            return list(pool.map(lambda item: extract(*item), items))
+
+    def _extract_price_logged(self, url: str, selector: str) -> Tuple[Optional[float], str]:
+        try:
+            return self.extract_price(url, selector)
+        except Exception as e:
+            logging.error("Price extraction failed for %s: %s", url, e)
+            return None, ""
+
+    def fetch_html(self, url: str) -> Optional[str]:
+        """Fetch a page's HTML with retries, without parsing it.
+
+        Returns None if every attempt fails.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                return self._get(url)
+            except requests.exceptions.RequestException as e:
+                logging.error("Request failed (attempt %d/%d): %s", attempt + 1, self.max_retries, e)
+
+            if attempt < self.max_retries - 1:
+                time.sleep(2 ** attempt)  # Exponential backoff
+
+        return None
+
+    def _get(self, url: str) -> str:
+        return self._request(url).text
+
+    def _request(self, url: str, etag: Optional[str] = None) -> requests.Response:
+        """GET url, conditional on etag if given; raises unless 200 (or 304 with etag)."""
+        headers = {"If-None-Match": etag} if etag else None
+        resp = self.session.get(url, timeout=self.timeout, headers=headers)
+        if resp.status_code == 304 and etag:
+            return resp
+        if resp.status_code != 200:
+            logging.warning("GET %s -> %s", url, resp.status_code)
+            raise requests.RequestException(f"HTTP {resp.status_code}")
+        return resp
+
     def _parse_price(self, price_text: str) -> Optional[float]:
         """Parse numeric price from text, handling common separators."""
-        if not price_text:
-            return None
+        return parse_price_text(price_text)
 
-        # Keep only digits and separators
-        s = re.sub(r"[^\d.,]", "", price_text)
 
-        if not s:
-            return None
+def extract_price_from_html(
+    html: str,
+    selector: str = "",
+    url: str = "",
+    auto_detector: Optional[PriceAutoDetector] = None,
+) -> Tuple[Optional[float], str]:
+    """Extract price from already-fetched HTML using CSS selector or auto-detection.
 
-        # If both separators exist, assume comma is thousands and dot is decimal (e.g., 1,234.56)
-        if "," in s and "." in s:
-            s = s.replace(",", "")
-            try:
-                return float(s)
-            except ValueError:
-                return None
-        # If only comma exists, treat comma as decimal (e.g., 19,99 -> 19.99)
-        if "," in s and "." not in s:
-            s = s.replace(",", ".")
-            try:
-                return float(s)
-            except ValueError:
-                return None
+    Pure function of its inputs (picklable), so it can run in a worker process.
 
-        # Plain float with dot or integer
-        try:
-            return float(s)
-        except ValueError:
-            return None
\ No newline at end of file
+    Returns:
+        Tuple of (price, selector_source) where selector_source is 'manual', 'auto', or empty string on failure
+    """
+    page = HtmlPage(html)
+
+    # Try manual selector first if provided
+    if selector:
+        text = page.select_text(selector)
+        if text is not None:
+            price = parse_price_text(text)
+            if price is not None:
+                return price, 'manual'
+            logging.warning("Failed to parse price from manual selector: %s", text)
+        else:
+            logging.warning("Manual selector not found: %s on %s", selector, url)
+
+    # Try auto-detection if manual failed or no selector provided
+    if auto_detector is None:
+        auto_detector = PriceAutoDetector()
+    detected_selector, platform, confidence = auto_detector.detect_price(page)
+    if detected_selector:
+        text = page.select_text(detected_selector)
+        if text is not None:
+            price = parse_price_text(text)
+            if price is not None:
+                logging.info("Auto-detected price on %s using %s selector (confidence: %.0f%%)", 
+                           url, platform, confidence * 100)
+                return price, 'auto'
+            logging.warning("Auto-detected selector found but failed to parse price: %s", text)
+        else:
+            logging.warning("Auto-detected selector not found in soup: %s", detected_selector)
+
+    # Both methods failed
+    logging.warning("Failed to extract price from %s (selector: %s, auto-detection: %s)", 
+                  url, selector or "none", "failed" if not detected_selector else "parse failed")
+    return None, ""
+
+
+def parse_price_text(price_text: str) -> Optional[float]:
+    """Parse numeric price from text, handling common separators."""
+    if not price_text:
+        return None
+
+    # Keep only digits and separators; a trailing separator ends a sentence
+    # ("19.99."), while a leading one is the decimal point (".99")
+    s = _NON_PRICE_CHARS_RE.sub("", price_text).rstrip(".,")
+
+    if not s:
+        return None
+
+    # The rightmost separator is the decimal point (1,234.56 / 1.234,56 / 19,99)
+    # unless it repeats, in which case it groups thousands (1,234,567)
+    dec = max(s.rfind("."), s.rfind(","))
+    if dec != -1:
+        if s.count(s[dec]) > 1:
+            s = _SEPARATORS_RE.sub("", s)
+        else:
+            s = f"{_SEPARATORS_RE.sub('', s[:dec])}.{s[dec + 1:]}"
+
+    try:
+        return float(s)
+    except ValueError:
+        return None
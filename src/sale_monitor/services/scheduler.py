@@ -1,7 +1,7 @@
-from datetime import datetime
-import schedule
-import time
 import logging
+import threading
+import time
+
 
 class Scheduler:
     """Handles scheduling tasks for checking product prices at regular intervals."""
@@ -9,20 +9,32 @@ class Scheduler:
     def __init__(self, interval_minutes: int, check_function):
         self.interval_minutes = interval_minutes
         self.check_function = check_function
+        self._stop = threading.Event()
 
     def start(self):
         """Start the scheduler to check prices at the specified interval."""
-        schedule.every(self.interval_minutes).minutes.do(self.check_function)
-        logging.info(f"Scheduler started: checking prices every {self.interval_minutes} minutes.")
-        
+        interval = self.interval_minutes * 60
+        logging.info("Scheduler started: checking prices every %d minutes.", self.interval_minutes)
+
+        # Monotonic deadlines are immune to wall-clock jumps; the loop wakes
+        # once per run (or when stop() is called), not on a polling tick
+        next_run = time.monotonic() + interval
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(1)
+            while not self._stop.wait(timeout=max(0.0, next_run - time.monotonic())):
+                self.check_function()
+                next_run += interval
+                # Skip runs missed while a slow check was in progress
+                now = time.monotonic()
+                if next_run <= now:
+                    next_run = now + interval
         except KeyboardInterrupt:
             logging.info("Scheduler stopped by user.")
 
+    def stop(self):
+        """Stop a running scheduler loop (safe to call from another thread)."""
+        self._stop.set()
+
     def run_once(self):
         """Run the check function once immediately."""
         logging.info("Running price check immediately.")
-        self.check_function()
\ No newline at end of file
+        self.check_function()
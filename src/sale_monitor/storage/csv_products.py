@@ -1,9 +1,20 @@
 import csv
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from sale_monitor.domain.models import Product
 
+# Accepted values of the optional cooldown_mode column
+COOLDOWN_MODES = ("rolling", "calendar_day")
+
+# Parsed products keyed by path -> ((mtime_ns, size), products)
+_cache: Dict[str, Tuple[Tuple[int, int], List[Product]]] = {}
+
+# Files modified more recently than this are not cached: filesystem mtime
+# granularity can hide a same-size rewrite made within the same tick
+_RACY_WINDOW_NS = 2_000_000_000
+
 
 def _parse_float(value: Optional[str]) -> Optional[float]:
     if value is None:
@@ -23,6 +34,11 @@ def _parse_bool(value: Optional[str]) -> bool:
     return str(value).strip().lower() not in ("false", "0", "no", "n")
 
 
+def _parse_cooldown_mode(value: Optional[str]) -> str:
+    value = (value or "").strip().lower()
+    return value if value in COOLDOWN_MODES else "rolling"
+
+
 def _parse_int(value: Optional[str], default: int) -> int:
     if value is None or str(value).strip() == "":
         return default
@@ -33,28 +49,65 @@ def _parse_int(value: Optional[str], default: int) -> int:
 
 
 def read_products(csv_path: str) -> List[Product]:
+    """Read products from CSV, re-parsing only when the file has changed.
+
+    Products are immutable, so cached instances are shared; callers get
+    their own list.
+    """
     path = Path(csv_path)
-    if not path.exists():
-        raise FileNotFoundError(f"Products CSV not found at: {csv_path}")
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Products CSV not found at: {csv_path}") from None
+
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _cache.get(csv_path)
+    if cached is not None and cached[0] == key:
+        return list(cached[1])
+
+    products = _parse_products(path)
+    if time.time_ns() - st.st_mtime_ns > _RACY_WINDOW_NS:
+        _cache[csv_path] = (key, products)
+        return list(products)
+    _cache.pop(csv_path, None)
+    return products
 
+
+def _parse_products(path: Path) -> List[Product]:
     products: List[Product] = []
     with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        required = {"name", "url"}
-        missing = required - set(reader.fieldnames or [])
+        reader = csv.reader(f)
+        header = next(reader, [])
+        missing = {"name", "url"} - set(header)
         if missing:
             raise ValueError(f"CSV is missing required columns: {', '.join(sorted(missing))}")
 
+        # Resolve column positions once; optional columns may be absent
+        col = {name: i for i, name in enumerate(header)}
+        i_name, i_url = col["name"], col["url"]
+        i_selector = col.get("selector")
+        i_target = col.get("target_price")
+        i_discount = col.get("discount_threshold")
+        i_enabled = col.get("enabled")
+        i_cooldown = col.get("notification_cooldown_hours")
+        i_source = col.get("selector_source")
+        i_mode = col.get("cooldown_mode")
+
+        def cell(row: List[str], i: Optional[int]) -> Optional[str]:
+            return row[i] if i is not None and i < len(row) else None
+
         for row in reader:
-            product = Product(
-                name=row["name"].strip(),
-                url=row["url"].strip(),
-                selector=row.get("selector", "").strip(),
-                target_price=_parse_float(row.get("target_price")),
-                discount_threshold=_parse_float(row.get("discount_threshold")),
-                enabled=_parse_bool(row.get("enabled", "true")),
-                notification_cooldown_hours=_parse_int(row.get("notification_cooldown_hours"), 24),
-                selector_source=row.get("selector_source", "").strip() or None,
-            )
-            products.append(product)
-    return products
\ No newline at end of file
+            if not row:
+                continue
+            products.append(Product(
+                name=row[i_name].strip(),
+                url=row[i_url].strip(),
+                selector=(cell(row, i_selector) or "").strip(),
+                target_price=_parse_float(cell(row, i_target)),
+                discount_threshold=_parse_float(cell(row, i_discount)),
+                enabled=_parse_bool(cell(row, i_enabled)),
+                notification_cooldown_hours=_parse_int(cell(row, i_cooldown), 24),
+                selector_source=(cell(row, i_source) or "").strip() or None,
+                cooldown_mode=_parse_cooldown_mode(cell(row, i_mode)),
+            ))
+    return products
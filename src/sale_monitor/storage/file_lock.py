@@ -1,8 +1,19 @@
 import os
-import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to msvcrt byte-range locks
+    fcntl = None
+    import msvcrt
+
 
 class FileLock:
-    """A simple file locking mechanism to prevent concurrent access."""
+    """A simple file locking mechanism to prevent concurrent access.
+
+    Waiters block in the kernel until the holder releases, and the lock is
+    dropped automatically if the holder dies, so a crash can't leave the
+    file locked. The ``.lock`` file itself is left in place.
+    """
 
     def __init__(self, filepath: str):
         self.filepath = filepath
@@ -10,20 +21,41 @@ class FileLock:
         self.lock_fd = None
 
     def acquire(self):
-        """Acquire a lock on the file."""
-        while True:
-            try:
-                # Try to create a lock file
-                self.lock_fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-                break
-            except FileExistsError:
-                # Wait and retry if the lock file already exists
-                time.sleep(0.1)
+        """Acquire a lock on the file, blocking until it is available."""
+        fd = os.open(self.lock_file, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        # LK_LOCK retries for ~10s before raising; keep waiting
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            os.close(fd)
+            raise
+        self.lock_fd = fd
 
     def release(self):
         """Release the lock on the file."""
-        if self.lock_fd is not None:
+        if self.lock_fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.lock_fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.lock_fd, msvcrt.LK_UNLCK, 1)
+        finally:
             os.close(self.lock_fd)
             self.lock_fd = None
-        if os.path.exists(self.lock_file):
-            os.remove(self.lock_file)
\ No newline at end of file
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -1,24 +1,175 @@
 import json
+import mmap
+import os
+import time
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
+
+from sale_monitor.storage.file_lock import FileLock
+
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the stdlib encoder/decoder
+    orjson = None
+
+# Compact the log into the snapshot once it grows past this size or the
+# snapshot size, whichever is larger
+_MIN_COMPACT_BYTES = 64 * 1024
+
+# (mtime_ns, size, inode) of a file, or None if it does not exist
+_FileKey = Optional[Tuple[int, int, int]]
+
+# Loaded state keyed by path -> ((snapshot key, log key), state)
+_cache: Dict[str, Tuple[Tuple[_FileKey, _FileKey], Dict[str, Any]]] = {}
+
+# Files modified more recently than this are not cached: filesystem mtime
+# granularity can hide a same-size rewrite made within the same tick
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+def _log_path(path: str) -> Path:
+    return Path(f"{path}.log")
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _load_file(p: Path) -> Any:
+    """Decode a JSON file, letting orjson parse straight from a read-only mapping."""
+    with p.open("rb") as f:
+        if orjson is None or os.fstat(f.fileno()).st_size == 0:
+            return _loads(f.read())
+        # Skips copying the whole file into a bytes object first
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+
+def _dumps(obj: Any, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=(orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS) if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _pretty_state() -> bool:
+    """Whether snapshots are written indented with sorted keys (for diffing by hand)."""
+    return os.getenv("SALE_MONITOR_PRETTY_STATE", "").strip().lower() in ("1", "true", "yes", "y", "on")
+
+
+def _file_key(p: Path) -> _FileKey:
+    try:
+        st = p.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _copy_state(state: Dict[str, Any]) -> Dict[str, Any]:
+    # Records are flat dicts that callers update in place; copying each one
+    # keeps the cached state intact at a fraction of a re-parse
+    return {key: dict(rec) if isinstance(rec, dict) else rec for key, rec in state.items()}
 
 
 def load_state(path: str) -> Dict[str, Any]:
+    """Load the state snapshot and replay any appended record updates.
+
+    Re-reads only when the snapshot or log has changed; callers get their
+    own copy of the records.
+    """
     p = Path(path)
-    if not p.exists():
-        return {}
-    try:
-        return json.loads(p.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return {}
+    key = (_file_key(p), _file_key(_log_path(path)))
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == key:
+        return _copy_state(cached[1])
+
+    state = _read_state(path)
+    newest = max((k[0] for k in key if k is not None), default=None)
+    if newest is not None and time.time_ns() - newest > _RACY_WINDOW_NS:
+        _cache[path] = (key, state)
+        return _copy_state(state)
+    _cache.pop(path, None)
+    return state
+
+
+def _read_state(path: str) -> Dict[str, Any]:
+    p = Path(path)
+    state: Dict[str, Any] = {}
+    if p.exists():
+        try:
+            state = _load_file(p)
+        except json.JSONDecodeError:
+            state = {}
+
+    log = _log_path(path)
+    if log.exists():
+        with log.open("rb") as f:
+            for line in f:
+                try:
+                    entry = _loads(line)
+                    state[entry["k"]] = entry["v"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    # Torn final line from an interrupted append
+                    continue
+    return state
 
 
 def save_state(path: str, data: Dict[str, Any]) -> None:
+    """Write a full state snapshot and discard the update log."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with FileLock(path):
+        _write_snapshot(path, data)
+
+
+def _write_snapshot(path: str, data: Dict[str, Any]) -> None:
+    """Atomically replace the snapshot and drop the log; caller holds the FileLock."""
     p = Path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    # Atomic write
-    with NamedTemporaryFile("w", delete=False, dir=str(p.parent), encoding="utf-8") as tmp:
-        json.dump(data, tmp, indent=2, sort_keys=True)
+    with NamedTemporaryFile("wb", delete=False, dir=str(p.parent)) as tmp:
+        tmp.write(_dumps(data, pretty=_pretty_state()))
         tmp.flush()
-    Path(tmp.name).replace(p)
\ No newline at end of file
+    Path(tmp.name).replace(p)
+    _log_path(path).unlink(missing_ok=True)
+
+
+def save_state_incremental(path: str, changed: Dict[str, Any]) -> None:
+    """Persist only changed records by appending them to the state log.
+
+    The log is folded back into the snapshot once it outgrows it, so the
+    amortized write cost tracks the number of updated records rather than
+    the total state size. Appends and compaction hold the state FileLock,
+    and compaction merges the files as they are on disk, so records
+    appended by another process (CLI vs web) are never dropped.
+
+    Args:
+        changed: records (key -> record) updated since the state was loaded
+    """
+    if not changed:
+        return
+
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    log = _log_path(path)
+    with FileLock(path):
+        snapshot_size = p.stat().st_size if p.exists() else 0
+        log_size = log.stat().st_size if log.exists() else 0
+        if not p.exists() or log_size > max(snapshot_size, _MIN_COMPACT_BYTES):
+            state = _read_state(path)
+            state.update(changed)
+            _write_snapshot(path, state)
+            return
+
+        with log.open("a+b") as f:
+            # An interrupted append leaves a torn last line; start on a fresh
+            # one so the next record isn't glued onto it and skipped on replay
+            if log_size:
+                f.seek(log_size - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            for key, rec in changed.items():
+                f.write(_dumps({"k": key, "v": rec}) + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
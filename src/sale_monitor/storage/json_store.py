@@ -2,6 +2,11 @@ from typing import List, Dict
 import json
 import os
 
+try:
+    import orjson
+except ImportError:  # Optional: fall back to the stdlib encoder/decoder
+    orjson = None
+
 class JSONStore:
     """Handles storage of product data in JSON format."""
     
@@ -12,15 +17,23 @@ class JSONStore:
     def _ensure_file_exists(self):
         """Ensure that the JSON file exists; create it if it does not."""
         if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w') as f:
-                json.dump([], f)  # Initialize with an empty list
+            with open(self.file_path, 'wb') as f:
+                f.write(b'[]')  # Initialize with an empty list
 
     def load_products(self) -> List[Dict]:
         """Load product data from the JSON file."""
-        with open(self.file_path, 'r') as f:
-            return json.load(f)
+        # Binary read: the decoders take UTF-8 bytes directly
+        with open(self.file_path, 'rb') as f:
+            data = f.read()
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
 
     def save_products(self, products: List[Dict]):
         """Save product data to the JSON file."""
-        with open(self.file_path, 'w') as f:
-            json.dump(products, f, indent=2)
\ No newline at end of file
+        if orjson is not None:
+            data = orjson.dumps(products, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(products, indent=2).encode('utf-8')
+        with open(self.file_path, 'wb') as f:
+            f.write(data)
@@ -1,24 +1,177 @@
 """
 SQLite-based storage for historical price data.
 """
+import csv
+import queue
 import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from itertools import groupby
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Per-connection settings (journal_mode=WAL is persistent and set in _init_db).
+# Under WAL, synchronous=NORMAL fsyncs at checkpoints rather than every commit
+# and stays corruption-safe; only the last commits can be lost on power failure.
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-8000",  # 8 MiB page cache per connection
+)
+
+# Connections are long-lived, so sqlite3's per-connection statement cache
+# (keyed on the SQL text) skips re-preparing these on every call
+_INSERT_PRICE = """
+    INSERT INTO price_history (product_url, product_name, price, timestamp, check_status)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Seconds a connection waits on a locked database before raising
+_BUSY_TIMEOUT = 5.0
+
+# Idle read connections kept open for reuse
+_READ_POOL_SIZE = 4
+
+# Rows fetched per batch when exporting
+_EXPORT_BATCH_SIZE = 1000
+
+_EXPORT_HEADER = ('product_name', 'product_url', 'price', 'timestamp', 'status')
+
+# Rows removed per transaction by cleanup_old_records
+_DELETE_BATCH_SIZE = 10000
+
+# Read results memoized by get_history/get_history_buckets/get_stats. Entries
+# are dropped when the database changes (any commit, from any connection or
+# process) and after the TTL, which bounds how far the moving `days` cutoff
+# can lag behind the clock.
+_RESULT_CACHE_SIZE = 256
+_RESULT_CACHE_TTL = 60.0
+
+# strftime formats truncating a timestamp to the start of its (UTC) bucket
+_BUCKET_FORMATS = {
+    "hour": "%Y-%m-%dT%H:00:00+00:00",
+    "day": "%Y-%m-%dT00:00:00+00:00",
+}
 
 
 class PriceHistory:
-    """Manages historical price data in SQLite."""
+    """Manages historical price data in SQLite.
+
+    db_path may be ":memory:" for a private in-memory history (e.g. tests);
+    it lives as long as this object and suits single-threaded use.
+    """
 
     def __init__(self, db_path: str):
         self.db_path = db_path
+        if db_path == ":memory:":
+            # Plain ":memory:" gives every connection its own empty database;
+            # a named shared-cache URI lets the writer and readers share one
+            self._connect_target = f"file:price_history_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._connect_target = db_path
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Connections live as long as this object: one writer, serialized by
+        # a lock, and a small pool of readers that WAL lets run alongside it
+        self._write_lock = threading.Lock()
+        self._write_conn = self._open()
+        self._read_pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=_READ_POOL_SIZE)
+        # Held only to poll PRAGMA data_version, whose value is per connection
+        self._version_lock = threading.Lock()
+        self._version_conn = self._open()
+        # Bumped by every local write; part of the result cache's validity key
+        self._generation = 0
+        self._cache_lock = threading.Lock()
+        self._result_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
         self._init_db()
 
+    def _open(self) -> sqlite3.Connection:
+        """Open a tuned connection usable from any thread (callers serialize access)."""
+        conn = sqlite3.connect(
+            self._connect_target, timeout=_BUSY_TIMEOUT, check_same_thread=False,
+            uri=self.db_path == ":memory:",
+        )
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """Hold the writer connection in a transaction; commits on success, rolls back on error."""
+        with self._write_lock:
+            try:
+                with self._write_conn:
+                    yield self._write_conn
+            finally:
+                self._generation += 1
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a pooled read connection."""
+        try:
+            conn = self._read_pool.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            try:
+                self._read_pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def data_version(self) -> Tuple[int, int]:
+        """Cheap token that changes whenever the database is written.
+
+        PRAGMA data_version moves on every commit made by another connection
+        (inserts, updates and deletes alike, from any process) without
+        reading the table; the local generation covers writes through this
+        object.
+        """
+        generation = self._generation
+        with self._version_lock:
+            (version,) = self._version_conn.execute("PRAGMA data_version").fetchone()
+        return generation, version
+
+    def _cached(self, key: tuple, compute):
+        """Return compute()'s result, reusing it while the table is unchanged."""
+        version = self.data_version()
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._result_cache.get(key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._result_cache.move_to_end(key)
+                return entry[2]
+        result = compute()
+        with self._cache_lock:
+            self._result_cache[key] = (version, now + _RESULT_CACHE_TTL, result)
+            self._result_cache.move_to_end(key)
+            if len(self._result_cache) > _RESULT_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+        return result
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._write_lock:
+            self._write_conn.close()
+        with self._version_lock:
+            self._version_conn.close()
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+
     def _init_db(self):
         """Initialize database schema."""
-        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
-        
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
+            # WAL lets readers (web dashboard) proceed while the monitor writes
+            # and avoids a full journal rewrite on every commit
+            conn.execute("PRAGMA journal_mode=WAL")
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS price_history (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -29,16 +182,17 @@ class PriceHistory:
                     check_status TEXT DEFAULT 'success'
                 )
             """)
-            # Index for faster queries
+            # Covering index for per-product history queries (newest first);
+            # supersedes the old single-column idx_product_url
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_product_url 
-                ON price_history(product_url)
+                CREATE INDEX IF NOT EXISTS idx_product_url_ts
+                ON price_history(product_url, timestamp DESC, price, check_status)
             """)
+            conn.execute("DROP INDEX IF EXISTS idx_product_url")
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_timestamp 
                 ON price_history(timestamp)
             """)
-            conn.commit()
 
     def record_price(
         self, 
@@ -53,28 +207,66 @@ class PriceHistory:
             # Store UTC with offset so clients can render correctly in local time
             timestamp = datetime.now(timezone.utc).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                """
-                INSERT INTO price_history (product_url, product_name, price, timestamp, check_status)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (product_url, product_name, price, timestamp, status)
-            )
-            conn.commit()
+        with self._write() as conn:
+            conn.execute(_INSERT_PRICE, (product_url, product_name, price, timestamp, status))
+
+    def record_prices_bulk(
+        self,
+        rows: Iterable[Tuple[str, str, float]],
+        timestamp: Optional[str] = None,
+        status: str = "success"
+    ) -> int:
+        """
+        Record many price checks in a single transaction.
+
+        Args:
+            rows: iterable of (product_url, product_name, price) tuples
+            timestamp: shared timestamp for all rows (defaults to now, UTC)
+
+        Returns the number of rows inserted.
+        """
+        if timestamp is None:
+            timestamp = datetime.now(timezone.utc).isoformat()
+
+        params = [(url, name, price, timestamp, status) for url, name, price in rows]
+        if not params:
+            return 0
+
+        with self._write() as conn:
+            conn.executemany(_INSERT_PRICE, params)
+        return len(params)
 
     def get_history(
         self, 
         product_url: str, 
         days: Optional[int] = None,
-        limit: Optional[int] = None
+        limit: Optional[int] = None,
+        before: Optional[str] = None
     ) -> List[Tuple[str, float, str]]:
         """
         Get price history for a product.
         
-        Returns list of (timestamp, price, status) tuples.
+        Args:
+            before: keyset cursor; only return records older than this
+                timestamp (pass the last timestamp of the previous page)
+
+        Returns list of (timestamp, price, status) tuples, newest first.
+        Results are memoized until the next write to the database; the
+        `days` cutoff may lag by up to _RESULT_CACHE_TTL seconds.
         """
-        with sqlite3.connect(self.db_path) as conn:
+        return list(self._cached(
+            ("history", product_url, days, limit, before),
+            lambda: self._query_history(product_url, days, limit, before),
+        ))
+
+    def _query_history(
+        self,
+        product_url: str,
+        days: Optional[int],
+        limit: Optional[int],
+        before: Optional[str]
+    ) -> List[Tuple[str, float, str]]:
+        with self._read() as conn:
             query = """
                 SELECT timestamp, price, check_status 
                 FROM price_history 
@@ -86,6 +278,10 @@ class PriceHistory:
                 cutoff = (datetime.now() - timedelta(days=days)).isoformat()
                 query += " AND timestamp >= ?"
                 params.append(cutoff)
+
+            if before is not None:
+                query += " AND timestamp < ?"
+                params.append(before)
             
             query += " ORDER BY timestamp DESC"
             
@@ -96,9 +292,73 @@ class PriceHistory:
             cursor = conn.execute(query, params)
             return cursor.fetchall()
 
+    def get_history_buckets(
+        self,
+        product_url: str,
+        bucket: str,
+        days: Optional[int] = None
+    ) -> List[Tuple[str, float, str]]:
+        """
+        Get price history averaged per hour or day, for charting long ranges.
+
+        Only successful checks are averaged; buckets are aligned to UTC.
+
+        Returns list of (bucket_start, avg_price, 'success') tuples, newest first.
+        Memoized like get_history: invalidated by any write, `days` cutoff
+        may lag by up to _RESULT_CACHE_TTL seconds.
+        """
+        fmt = _BUCKET_FORMATS.get(bucket)
+        if fmt is None:
+            raise ValueError(f"Unknown bucket: {bucket!r} (expected one of {', '.join(_BUCKET_FORMATS)})")
+        return list(self._cached(
+            ("buckets", product_url, bucket, days),
+            lambda: self._query_history_buckets(product_url, fmt, days),
+        ))
+
+    def _query_history_buckets(
+        self, product_url: str, fmt: str, days: Optional[int]
+    ) -> List[Tuple[str, float, str]]:
+        query = """
+            SELECT strftime(?, timestamp) AS bucket, AVG(price), 'success'
+            FROM price_history
+            WHERE product_url = ? AND check_status = 'success'
+        """
+        params = [fmt, product_url]
+        if days is not None:
+            query += " AND timestamp >= ?"
+            params.append((datetime.now() - timedelta(days=days)).isoformat())
+        query += " GROUP BY bucket ORDER BY bucket DESC"
+
+        with self._read() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get_success_series(self, days: Optional[int] = None) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Get successful checks for every product in one query.
+
+        Returns a mapping of product_url -> list of (timestamp, price), newest first.
+        """
+        query = """
+            SELECT product_url, timestamp, price
+            FROM price_history
+            WHERE check_status = 'success'
+        """
+        params = []
+        if days is not None:
+            query += " AND timestamp >= ?"
+            params.append((datetime.now() - timedelta(days=days)).isoformat())
+        query += " ORDER BY product_url, timestamp DESC"
+
+        with self._read() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return {
+            url: [(ts, price) for _, ts, price in group]
+            for url, group in groupby(rows, key=lambda row: row[0])
+        }
+
     def get_all_products(self) -> List[Tuple[str, str]]:
         """Get list of all products with history. Returns (url, name) tuples."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._read() as conn:
             cursor = conn.execute("""
                 SELECT DISTINCT product_url, product_name 
                 FROM price_history 
@@ -116,21 +376,27 @@ class PriceHistory:
         
         Returns list of (timestamp, old_price, new_price) tuples.
         """
-        history = self.get_history(product_url, days=days)
-        if not history:
-            return []
-        
-        changes = []
-        prev_price = None
-        
-        for timestamp, price, status in reversed(history):  # oldest to newest
-            if status != "success":
-                continue
-            if prev_price is not None and price != prev_price:
-                changes.append((timestamp, prev_price, price))
-            prev_price = price
-        
-        return list(reversed(changes))  # newest to oldest
+        # LAG pairs each successful check with the previous one so only the
+        # changed rows leave SQLite
+        query = """
+            SELECT timestamp, prev_price, price FROM (
+                SELECT timestamp, price,
+                       LAG(price) OVER (ORDER BY timestamp, id) AS prev_price
+                FROM price_history
+                WHERE product_url = ? AND check_status = 'success'
+        """
+        params = [product_url]
+        if days is not None:
+            query += " AND timestamp >= ?"
+            params.append((datetime.now() - timedelta(days=days)).isoformat())
+        query += """
+            )
+            WHERE prev_price IS NOT NULL AND prev_price <> price
+            ORDER BY timestamp DESC
+        """
+
+        with self._read() as conn:
+            return conn.execute(query, params).fetchall()
 
     def cleanup_old_records(self, retention_days: int):
         """Delete records older than retention_days."""
@@ -139,39 +405,80 @@ class PriceHistory:
         
         cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
         
-        with sqlite3.connect(self.db_path) as conn:
-            result = conn.execute(
-                "DELETE FROM price_history WHERE timestamp < ?",
-                (cutoff,)
-            )
-            deleted = result.rowcount
-            conn.commit()
-            return deleted
+        # Delete in bounded batches, each its own transaction, so the write
+        # lock is released between batches and other writers can interleave
+        deleted = 0
+        while True:
+            with self._write() as conn:
+                result = conn.execute(
+                    """
+                    DELETE FROM price_history WHERE id IN (
+                        SELECT id FROM price_history WHERE timestamp < ? LIMIT ?
+                    )
+                    """,
+                    (cutoff, _DELETE_BATCH_SIZE)
+                )
+            deleted += result.rowcount
+            if result.rowcount < _DELETE_BATCH_SIZE:
+                break
+
+        if deleted:
+            # Hand the freed WAL space back to the filesystem
+            with self._write() as conn:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
 
     def get_stats(self, product_url: str, days: Optional[int] = None) -> dict:
-        """Get statistics for a product, using frontend-expected key names."""
-        history = self.get_history(product_url, days=days)
-        if not history:
-            return {}
-        prices = []
-        for _, price, status in history:
-            if status != "success":
-                continue
-            try:
-                prices.append(float(price))
-            except (TypeError, ValueError):
-                continue
-        if not prices:
-            return {}
-        total = len(prices)
+        """Get statistics for a product, using frontend-expected key names.
+
+        Memoized like get_history: invalidated by any write, `days` cutoff
+        may lag by up to _RESULT_CACHE_TTL seconds.
+        """
+        return dict(self._cached(
+            ("stats", product_url, days),
+            lambda: self._query_stats(product_url, days),
+        ))
+
+    def _query_stats(self, product_url: str, days: Optional[int]) -> dict:
+        where = "WHERE product_url = ?"
+        params = [product_url]
+        if days is not None:
+            where += " AND timestamp >= ?"
+            params.append((datetime.now() - timedelta(days=days)).isoformat())
+
+        # Aggregates run in SQLite; price stats cover successful checks only,
+        # check timestamps cover every check in the window
+        with self._read() as conn:
+            min_price, max_price, avg_price, total, first_check, latest_check = conn.execute(
+                f"""
+                SELECT MIN(CASE WHEN check_status = 'success' THEN price END),
+                       MAX(CASE WHEN check_status = 'success' THEN price END),
+                       AVG(CASE WHEN check_status = 'success' THEN price END),
+                       COUNT(CASE WHEN check_status = 'success' THEN 1 END),
+                       MIN(timestamp),
+                       MAX(timestamp)
+                FROM price_history {where}
+                """,
+                params,
+            ).fetchone()
+            if not total:
+                return {}
+            current_price = conn.execute(
+                f"""
+                SELECT price FROM price_history {where} AND check_status = 'success'
+                ORDER BY timestamp DESC LIMIT 1
+                """,
+                params,
+            ).fetchone()[0]
+
         stats = {
-            "min_price": min(prices),
-            "max_price": max(prices),
-            "avg_price": sum(prices) / total,
-            "current_price": prices[0],  # Most recent
+            "min_price": min_price,
+            "max_price": max_price,
+            "avg_price": avg_price,
+            "current_price": current_price,  # Most recent
             "total_checks": total,
-            "first_check": history[-1][0],
-            "latest_check": history[0][0],
+            "first_check": first_check,
+            "latest_check": latest_check,
         }
         # Back-compat for existing callers/tests
         stats["checks_count"] = total
@@ -180,60 +487,49 @@ class PriceHistory:
 
     def export_to_csv(self, output_path: str, product_url: Optional[str] = None):
         """Export history to CSV file."""
-        import csv
-        
-        with sqlite3.connect(self.db_path) as conn:
-            if product_url:
-                cursor = conn.execute(
-                    """
-                    SELECT product_name, product_url, price, timestamp, check_status 
-                    FROM price_history 
-                    WHERE product_url = ?
-                    ORDER BY timestamp DESC
-                    """,
-                    (product_url,)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT product_name, product_url, price, timestamp, check_status 
-                    FROM price_history 
-                    ORDER BY timestamp DESC
-                    """
-                )
-            
-            with open(output_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['product_name', 'product_url', 'price', 'timestamp', 'status'])
-                writer.writerows(cursor)
+        # Rows are streamed from the cursor; a large buffer keeps write syscalls few
+        with open(output_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
+            self.export_to_csv_stream(f, product_url)
 
     def export_to_csv_stream(self, output_stream, product_url: Optional[str] = None):
-        """Export history to a CSV stream (file-like object)."""
-        import csv
-        
-        with sqlite3.connect(self.db_path) as conn:
-            if product_url:
-                cursor = conn.execute(
-                    """
-                    SELECT product_name, product_url, price, timestamp, check_status 
-                    FROM price_history 
-                    WHERE product_url = ?
-                    ORDER BY timestamp DESC
-                    """,
-                    (product_url,)
-                )
-            else:
-                cursor = conn.execute(
-                    """
-                    SELECT product_name, product_url, price, timestamp, check_status 
-                    FROM price_history 
-                    ORDER BY timestamp DESC
-                    """
-                )
-            
+        """Export history to a CSV stream (file-like object).
+
+        Rows are written as they are read from the cursor, so memory use
+        does not grow with the size of the history.
+        """
+        with self._read() as conn:
             writer = csv.writer(output_stream)
-            writer.writerow(['product_name', 'product_url', 'price', 'timestamp', 'status'])
-            writer.writerows(cursor)
+            writer.writerow(_EXPORT_HEADER)
+            for rows in self._export_batches(conn, product_url):
+                writer.writerows(rows)
+
+    @staticmethod
+    def _export_batches(conn: sqlite3.Connection, product_url: Optional[str]) -> Iterator[List[tuple]]:
+        """Yield export rows, newest first, in fixed-size batches."""
+        if product_url:
+            cursor = conn.execute(
+                """
+                SELECT product_name, product_url, price, timestamp, check_status 
+                FROM price_history 
+                WHERE product_url = ?
+                ORDER BY timestamp DESC
+                """,
+                (product_url,)
+            )
+        else:
+            cursor = conn.execute(
+                """
+                SELECT product_name, product_url, price, timestamp, check_status 
+                FROM price_history 
+                ORDER BY timestamp DESC
+                """
+            )
+        cursor.arraysize = _EXPORT_BATCH_SIZE
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield rows
 
     def normalize_names(self, name_by_url: dict) -> int:
         """Normalize product_name values in DB to match provided mapping.
@@ -248,7 +544,7 @@ class PriceHistory:
             return 0
 
         total_updated = 0
-        with sqlite3.connect(self.db_path) as conn:
+        with self._write() as conn:
             for url, correct_name in name_by_url.items():
                 if not correct_name:
                     continue
@@ -261,6 +557,5 @@ class PriceHistory:
                     (correct_name, url, correct_name),
                 )
                 total_updated += cur.rowcount or 0
-            conn.commit()
 
         return total_updated
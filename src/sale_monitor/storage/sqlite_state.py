@@ -0,0 +1,102 @@
+"""
+SQLite-backed storage for per-product monitor state.
+"""
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from sale_monitor.storage.base import StorageBase
+from sale_monitor.storage.json_state import load_state
+
+
+class SQLiteStateStore(StorageBase):
+    """Stores per-product state as one row per URL so updates are point writes.
+
+    The table lives alongside price_history in the history database.
+    """
+
+    def __init__(self, db_path: str, import_from: Optional[str] = None):
+        self.db_path = db_path
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection for the store's lifetime, so calls don't pay for
+        # opening the file and reading the schema; the lock serializes threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_db()
+        if import_from:
+            self._import_json(import_from)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Hold the connection in a transaction; commits on success, rolls back on error."""
+        with self._lock, self._conn:
+            yield self._conn
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _init_db(self):
+        """Initialize database schema."""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS product_state (
+                    url TEXT PRIMARY KEY,
+                    rec_json TEXT NOT NULL
+                ) WITHOUT ROWID
+            """)
+
+    def _import_json(self, state_file: str) -> int:
+        """Import an existing state.json once, when the table is still empty."""
+        if not Path(state_file).exists():
+            return 0
+        with self._connect() as conn:
+            (count,) = conn.execute("SELECT COUNT(1) FROM product_state").fetchone()
+        if count:
+            return 0
+        state = load_state(state_file)
+        self.save(state)
+        return len(state)
+
+    def load(self) -> Dict[str, Any]:
+        """Load state for all products as a url -> record mapping."""
+        with self._connect() as conn:
+            cursor = conn.execute("SELECT url, rec_json FROM product_state")
+            return {url: json.loads(rec_json) for url, rec_json in cursor}
+
+    def get(self, url: str) -> Dict[str, Any]:
+        """Get the state record for a single product (empty if unknown)."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT rec_json FROM product_state WHERE url = ?", (url,)
+            ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save(self, data: Dict[str, Any]) -> None:
+        """Upsert the given records; records not in data are left untouched."""
+        if not data:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                """
+                INSERT INTO product_state (url, rec_json) VALUES (?, ?)
+                ON CONFLICT(url) DO UPDATE SET rec_json = excluded.rec_json
+                """,
+                [(url, json.dumps(rec)) for url, rec in data.items()]
+            )
+
+    def delete(self, key: str) -> None:
+        """Delete the state record for a product."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM product_state WHERE url = ?", (key,))
+
+    def clear(self) -> None:
+        """Delete all state records."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM product_state")
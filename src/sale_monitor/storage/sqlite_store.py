@@ -1,25 +1,55 @@
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterable, List
 import sqlite3
 import os
 import logging
+import threading
+
+# Columns returned for each product, in dict key order
+_PRODUCT_COLUMNS = (
+    'id', 'name', 'url', 'target_price', 'current_price', 'discount_threshold',
+    'selector', 'enabled', 'last_checked', 'last_price', 'last_notification_sent',
+    'last_notification_price', 'notification_cooldown_hours',
+)
+
+_INSERT_PRODUCT = (
+    f"INSERT INTO products ({', '.join(_PRODUCT_COLUMNS[1:])}) "
+    f"VALUES ({', '.join('?' * len(_PRODUCT_COLUMNS[1:]))})"
+)
 
 class SQLiteStore:
     """SQLite storage backend for storing product data."""
 
     def __init__(self, db_path: str):
         self.db_path = db_path
-        self.connection = self._create_connection()
+        # One lazily opened connection per thread (sqlite3 connections are
+        # thread-bound); writes are serialized so threads don't contend for
+        # SQLite's lock
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        if not os.path.exists(self.db_path):
+            logging.info(f"Database not found. Creating new database at {self.db_path}.")
         self._create_table()
 
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The calling thread's connection, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._create_connection()
+            self._local.conn = conn
+        return conn
+
     def _create_connection(self) -> sqlite3.Connection:
         """Create a database connection to the SQLite database."""
-        if not os.path.exists(self.db_path):
-            logging.info(f"Database not found. Creating new database at {self.db_path}.")
-        return sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Rows map column names to values in C; dict(row) builds the product
+        conn.row_factory = sqlite3.Row
+        return conn
 
     def _create_table(self):
         """Create the products table if it doesn't exist."""
-        with self.connection:
+        with self._write_lock, self.connection:
             self.connection.execute("""
                 CREATE TABLE IF NOT EXISTS products (
                     id INTEGER PRIMARY KEY,
@@ -40,51 +70,29 @@ class SQLiteStore:
 
     def save_product(self, product: Dict[str, Any]):
         """Save a product to the database."""
-        with self.connection:
-            self.connection.execute("""
-                INSERT INTO products (name, url, target_price, current_price, discount_threshold, selector, enabled, last_checked, last_price, last_notification_sent, last_notification_price, notification_cooldown_hours)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                product['name'],
-                product['url'],
-                product['target_price'],
-                product['current_price'],
-                product['discount_threshold'],
-                product['selector'],
-                product['enabled'],
-                product['last_checked'],
-                product['last_price'],
-                product['last_notification_sent'],
-                product['last_notification_price'],
-                product['notification_cooldown_hours']
-            ))
+        self.save_products([product])
+
+    def save_products(self, products: Iterable[Dict[str, Any]]):
+        """Save many products in a single transaction."""
+        params = [tuple(product[col] for col in _PRODUCT_COLUMNS[1:]) for product in products]
+        if not params:
+            return
+        # executemany binds one row at a time, so SQLite's variable limit
+        # doesn't apply; one commit covers the whole batch
+        with self._write_lock, self.connection:
+            self.connection.executemany(_INSERT_PRODUCT, params)
 
     def load_products(self) -> List[Dict[str, Any]]:
         """Load all products from the database."""
-        cursor = self.connection.cursor()
-        cursor.execute("SELECT * FROM products")
-        rows = cursor.fetchall()
-        return [self._row_to_product_dict(row) for row in rows]
-
-    def _row_to_product_dict(self, row: tuple) -> Dict[str, Any]:
-        """Convert a database row to a product dictionary."""
-        return {
-            'id': row[0],
-            'name': row[1],
-            'url': row[2],
-            'target_price': row[3],
-            'current_price': row[4],
-            'discount_threshold': row[5],
-            'selector': row[6],
-            'enabled': row[7],
-            'last_checked': row[8],
-            'last_price': row[9],
-            'last_notification_sent': row[10],
-            'last_notification_price': row[11],
-            'notification_cooldown_hours': row[12]
-        }
+        cursor = self.connection.execute(f"SELECT {', '.join(_PRODUCT_COLUMNS)} FROM products")
+        return [dict(row) for row in cursor]
 
     def close(self):
-        """Close the database connection."""
-        if self.connection:
-            self.connection.close()
\ No newline at end of file
+        """Close the calling thread's database connection.
+
+        Other threads' connections are released when those threads exit.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
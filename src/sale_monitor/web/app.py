@@ -1,33 +1,80 @@
 """
 Flask web application for Sale Monitor dashboard.
 """
-from flask import Flask, render_template, jsonify, request, Response
+from flask import Flask, render_template, jsonify, request, send_file
+from dataclasses import replace
 from datetime import datetime, timezone
+from io import StringIO
+from tempfile import NamedTemporaryFile
 import os
 import csv
 import sqlite3
 import requests
 import logging
+import threading
+import time
+from concurrent.futures import Future
 
 from sale_monitor.storage.csv_products import read_products
-from sale_monitor.storage.json_state import load_state, save_state
+from sale_monitor.storage.json_state import load_state, save_state_incremental
 from sale_monitor.storage.price_history import PriceHistory
+from sale_monitor.storage.sqlite_state import SQLiteStateStore
 from sale_monitor.services.price_extractor import PriceExtractor
 from sale_monitor.domain.models import Product
 from sale_monitor.storage.file_lock import FileLock
+from sale_monitor.web import json_provider
+
+
+_PRODUCTS_CSV_HEADER = (
+    'name', 'url', 'target_price', 'discount_threshold', 'selector', 'enabled',
+    'notification_cooldown_hours', 'selector_source', 'cooldown_mode',
+)
+
+# Points a history chart needs at most; longer ranges are downsampled
+_MAX_CHART_POINTS = 500
+
+# Accepted values of /api/product/history's bucket parameter
+_HISTORY_BUCKETS = ('auto', 'raw', 'hour', 'day')
 
 
 def create_app():
     """Create and configure Flask application."""
     flask_app = Flask(__name__)
+    if json_provider.orjson is not None:
+        flask_app.json = json_provider.ORJSONProvider(flask_app)
     
     # Configuration
     flask_app.config['PRODUCTS_CSV'] = os.getenv('PRODUCTS_CSV', 'data/products.csv')
     flask_app.config['STATE_FILE'] = os.getenv('STATE_FILE', 'data/state.json')
     flask_app.config['HISTORY_DB'] = os.getenv('HISTORY_DB', 'data/history.db')
+    flask_app.config['STATE_BACKEND'] = os.getenv('STATE_BACKEND', 'json')
     flask_app.config['USER_AGENT'] = os.getenv('USER_AGENT', 'Mozilla/5.0 (compatible; SaleMonitor/1.0)')
     flask_app.config['TIMEOUT'] = int(os.getenv('TIMEOUT', '30'))
     flask_app.config['MAX_RETRIES'] = int(os.getenv('MAX_RETRIES', '3'))
+    flask_app.config['MAX_WORKERS'] = int(os.getenv('MAX_WORKERS', '8'))
+    # A manual check repeated within this many seconds reuses the last result
+    flask_app.config['CHECK_CACHE_SECONDS'] = float(os.getenv('CHECK_CACHE_SECONDS', '10'))
+    
+    # One history store per app: its pooled connections are reused across
+    # requests instead of re-opening the DB and re-running schema DDL each time
+    flask_app.extensions['price_history'] = PriceHistory(flask_app.config['HISTORY_DB'])
+    flask_app.extensions['history_export'] = {'lock': threading.Lock(), 'version': None}
+    # url -> (monotonic time, result) of recent manual checks, and url -> Future
+    # for checks in flight, so repeated clicks and open tabs share one fetch
+    flask_app.extensions['manual_checks'] = {'lock': threading.Lock(), 'recent': {}, 'pending': {}}
+    if flask_app.config['STATE_BACKEND'] == 'sqlite':
+        # Likewise for the state table: the schema check and one-off JSON
+        # import run at startup, not on every request
+        flask_app.extensions['state_store'] = SQLiteStateStore(
+            flask_app.config['HISTORY_DB'], import_from=flask_app.config['STATE_FILE']
+        )
+    # Shared extractor: its session keeps connections (and TLS sessions) to
+    # each store alive between checks, and its ETag cache persists
+    flask_app.extensions['price_extractor'] = PriceExtractor(
+        user_agent=flask_app.config['USER_AGENT'],
+        timeout=flask_app.config['TIMEOUT'],
+        max_retries=flask_app.config['MAX_RETRIES']
+    )
     
     @flask_app.route('/')
     def index():
@@ -54,7 +101,7 @@ def create_app():
         """Get all products with current state."""
         try:
             products = read_products(flask_app.config['PRODUCTS_CSV'])
-            state = load_state(flask_app.config['STATE_FILE'])
+            state = _load_state(flask_app)
             
             result = []
             for p in products:
@@ -75,33 +122,41 @@ def create_app():
                     'selector_source': selector_source,
                 })
             
-            return jsonify(result)
+            return _conditional_json(result)
         except (OSError, ValueError) as e:
             return jsonify({'error': str(e)}), 500
     
     @flask_app.route('/api/product/history')
     def api_product_history():
         """Get price history for a product."""
+        bucket = request.args.get('bucket', 'auto')
+        if bucket not in _HISTORY_BUCKETS:
+            return jsonify({'error': f"bucket must be one of: {', '.join(_HISTORY_BUCKETS)}"}), 400
+
         try:
             url = request.args.get('url')
             if not url:
                 return jsonify({'error': 'URL parameter required'}), 400
             
-            history = PriceHistory(flask_app.config['HISTORY_DB'])
+            history = flask_app.extensions['price_history']
             days = int(request.args.get('days', 30))
+            if bucket == 'auto':
+                # Hourly points while they fit the chart budget, daily beyond
+                bucket = 'hour' if days * 24 <= _MAX_CHART_POINTS else 'day'
             
-            records = history.get_history(url, days=days)
+            if bucket == 'raw':
+                records = history.get_history(url, days=days)
+            else:
+                records = history.get_history_buckets(url, bucket, days=days)
             
-            result = [
-                {
-                    'timestamp': timestamp,
-                    'price': price,
-                    'status': status
-                }
-                for timestamp, price, status in records
-            ]
+            # Columnar payload: parallel arrays instead of one object per point
+            timestamps, prices, statuses = zip(*records) if records else ((), (), ())
             
-            return jsonify(result)
+            return _conditional_json({
+                'timestamp': timestamps,
+                'price': prices,
+                'status': statuses
+            })
         except (OSError, ValueError, sqlite3.Error) as e:
             return jsonify({'error': str(e)}), 500
     
@@ -113,11 +168,11 @@ def create_app():
             if not url:
                 return jsonify({'error': 'URL parameter required'}), 400
 
-            history = PriceHistory(flask_app.config['HISTORY_DB'])
+            history = flask_app.extensions['price_history']
             days = int(request.args.get('days', 30))
 
             stats = history.get_stats(url, days=days)
-            return jsonify(stats)
+            return _conditional_json(stats)
         except (OSError, ValueError, sqlite3.Error) as e:
             return jsonify({'error': str(e)}), 500
     
@@ -134,21 +189,15 @@ def create_app():
             products = read_products(flask_app.config['PRODUCTS_CSV'])
             
             # Find and toggle the product
-            found = False
-            updated_products = []
-            for p in products:
-                if p.url == url:
-                    p.enabled = not p.enabled
-                    found = True
-                updated_products.append(p)
-            
-            if not found:
+            i = _index_of(products, url)
+            if i is None:
                 return jsonify({'error': 'Product not found'}), 404
+            products[i] = product = replace(products[i], enabled=not products[i].enabled)
             
             # Write back to CSV
-            _write_products_csv(flask_app.config['PRODUCTS_CSV'], updated_products)
+            _write_products_csv(flask_app.config['PRODUCTS_CSV'], products)
             
-            return jsonify({'success': True, 'enabled': [p for p in updated_products if p.url == url][0].enabled})
+            return jsonify({'success': True, 'enabled': product.enabled})
         except (OSError, ValueError) as e:
             return jsonify({'error': str(e)}), 500
     
@@ -169,28 +218,28 @@ def create_app():
                 return jsonify({'error': 'Product not found'}), 404
             
             # Extract price
-            extractor = PriceExtractor(
-                user_agent=flask_app.config['USER_AGENT'],
-                timeout=flask_app.config['TIMEOUT'],
-                max_retries=flask_app.config['MAX_RETRIES']
-            )
-            price, selector_source = extractor.extract_price(product.url, product.selector)
+            price, selector_source, checked_at, fresh = _check_price_once(flask_app, product)
             
             if price is None:
                 return jsonify({'error': 'Failed to extract price'}), 500
             
+            if not fresh:
+                # Another request just fetched (or is recording) this price
+                return jsonify({
+                    'success': True,
+                    'price': price,
+                    'timestamp': checked_at,
+                    'selector_source': selector_source,
+                    'cached': True
+                })
+            
             # Update state
-            state = load_state(flask_app.config['STATE_FILE'])
-            state[url] = {
-                'current_price': price,
-                'last_checked': datetime.now(timezone.utc).isoformat(),
-                'last_price': state.get(url, {}).get('current_price', price),
-                'selector_source': selector_source
-            }
-            save_state(flask_app.config['STATE_FILE'], state)
+            state = _load_state(flask_app)
+            state[url] = _checked_record(state.get(url), price, selector_source, checked_at)
+            _save_state(flask_app, {url: state[url]})
             
             # Record in history (count as success so stats include manual checks)
-            history = PriceHistory(flask_app.config['HISTORY_DB'])
+            history = flask_app.extensions['price_history']
             history.record_price(product.url, product.name, price, status='success')
             
             return jsonify({
@@ -202,6 +251,45 @@ def create_app():
         except (OSError, ValueError, sqlite3.Error, requests.exceptions.RequestException) as e:
             return jsonify({'error': str(e)}), 500
     
+    @flask_app.route('/api/products/check_all', methods=['POST'])
+    def api_check_all_products():
+        """Check prices for all enabled products concurrently."""
+        try:
+            products = [p for p in read_products(flask_app.config['PRODUCTS_CSV']) if p.enabled]
+            
+            extractor = flask_app.extensions['price_extractor']
+            # A couple of requests per store at a time keeps us polite
+            results = extractor.extract_prices_bulk(
+                [(p.url, p.selector) for p in products],
+                max_workers=flask_app.config['MAX_WORKERS'],
+                max_per_host=2,
+            )
+            
+            state = _load_state(flask_app)
+            checked_at = datetime.now(timezone.utc).isoformat()
+            changed = {}
+            rows = []
+            for product, (price, selector_source) in zip(products, results):
+                if price is None:
+                    continue
+                changed[product.url] = _checked_record(state.get(product.url), price, selector_source, checked_at)
+                rows.append((product.url, product.name, price))
+            
+            # One state write and one history transaction for the whole run
+            if changed:
+                _save_state(flask_app, changed)
+                flask_app.extensions['price_history'].record_prices_bulk(rows, timestamp=checked_at)
+            
+            return jsonify({
+                'success': True,
+                'successful': len(changed),
+                'failed': len(products) - len(changed),
+                'prices': {url: rec['current_price'] for url, rec in changed.items()},
+                'timestamp': checked_at
+            })
+        except (OSError, ValueError, sqlite3.Error) as e:
+            return jsonify({'error': str(e)}), 500
+    
     @flask_app.route('/api/product/delete', methods=['POST'])
     def api_delete_product():
         """Delete a product."""
@@ -231,38 +319,31 @@ def create_app():
         try:
             products = read_products(flask_app.config['PRODUCTS_CSV'])
             
-            extractor = PriceExtractor(
-                user_agent=flask_app.config['USER_AGENT'],
-                timeout=flask_app.config['TIMEOUT'],
-                max_retries=flask_app.config['MAX_RETRIES']
-            )
+            extractor = flask_app.extensions['price_extractor']
             
             successful = 0
             failed = 0
             updated_products = []
             
-            for product in products:
-                try:
-                    # Try to extract price with empty selector to force auto-detection
-                    price, selector_source = extractor.extract_price(product.url, "")
-                    
-                    if price is not None and selector_source == 'auto':
-                        # Auto-detection succeeded - clear selector and mark as auto
-                        product.selector = ''
-                        product.selector_source = 'auto'
-                        successful += 1
-                    else:
-                        # Keep existing product unchanged
-                        failed += 1
-                    
-                    updated_products.append(product)
-                except Exception as e:
-                    logging.error(f"Auto-detect failed for {product.url}: {e}")
-                    updated_products.append(product)  # Keep original
+            # Empty selectors force auto-detection; pages are fetched concurrently
+            results = extractor.extract_prices_bulk(
+                [(product.url, "") for product in products],
+                max_workers=flask_app.config['MAX_WORKERS'],
+            )
+            for product, (price, selector_source) in zip(products, results):
+                if price is not None and selector_source == 'auto':
+                    # Auto-detection succeeded - clear selector and mark as auto
+                    product = replace(product, selector='', selector_source='auto')
+                    successful += 1
+                else:
+                    # Keep existing product unchanged
                     failed += 1
+                
+                updated_products.append(product)
             
-            # Write updated products back to CSV
-            _write_products_csv(flask_app.config['PRODUCTS_CSV'], updated_products)
+            # Write updated products back to CSV, unless every row is as it was
+            if updated_products != products:
+                _write_products_csv(flask_app.config['PRODUCTS_CSV'], updated_products)
             
             return jsonify({
                 'success': True,
@@ -355,55 +436,53 @@ def create_app():
             # Read products
             products = read_products(flask_app.config['PRODUCTS_CSV'])
             
-            # Find and update
-            found = False
-            for i, p in enumerate(products):
-                if p.url == url:
-                    # Safe parsing helpers with validation
-                    def _parse_float(val, current, field_name):
-                        if val in (None, ''):
-                            return current
-                        try:
-                            return float(val)
-                        except (TypeError, ValueError) as exc:
-                            raise ValueError(f'{field_name} must be a valid number') from exc
-
-                    def _parse_int(val, current, field_name):
-                        if val in (None, ''):
-                            return current
-                        try:
-                            parsed = int(val)
-                            if parsed < 0:
-                                raise ValueError(f'{field_name} must be a positive number')
-                            return parsed
-                        except (TypeError, ValueError) as exc:
-                            raise ValueError(f'{field_name} must be a valid positive integer') from exc
-
-                    try:
-                        target_price = _parse_float(data.get('target_price'), p.target_price, 'target_price')
-                        discount_threshold = _parse_float(data.get('discount_threshold'), p.discount_threshold, 'discount_threshold')
-                        cooldown_hours = _parse_int(data.get('notification_cooldown_hours'), p.notification_cooldown_hours, 'notification_cooldown_hours')
-                    except ValueError as ve:
-                        return jsonify({'error': str(ve)}), 400
-
-                    products[i] = Product(
-                        name=data.get('name', p.name),
-                        url=url,
-                        target_price=target_price,
-                        discount_threshold=discount_threshold,
-                        selector=data.get('selector', p.selector),
-                        enabled=data.get('enabled', p.enabled),
-                        notification_cooldown_hours=cooldown_hours
-                    )
-                    found = True
-                    break
-            
-            if not found:
+            i = _index_of(products, url)
+            if i is None:
                 return jsonify({'error': 'Product not found'}), 404
+            p = products[i]
             
-            _write_products_csv(flask_app.config['PRODUCTS_CSV'], products)
+            # Safe parsing helpers with validation
+            def _parse_float(val, current, field_name):
+                if val in (None, ''):
+                    return current
+                try:
+                    return float(val)
+                except (TypeError, ValueError) as exc:
+                    raise ValueError(f'{field_name} must be a valid number') from exc
+
+            def _parse_int(val, current, field_name):
+                if val in (None, ''):
+                    return current
+                try:
+                    parsed = int(val)
+                    if parsed < 0:
+                        raise ValueError(f'{field_name} must be a positive number')
+                    return parsed
+                except (TypeError, ValueError) as exc:
+                    raise ValueError(f'{field_name} must be a valid positive integer') from exc
+
+            try:
+                target_price = _parse_float(data.get('target_price'), p.target_price, 'target_price')
+                discount_threshold = _parse_float(data.get('discount_threshold'), p.discount_threshold, 'discount_threshold')
+                cooldown_hours = _parse_int(data.get('notification_cooldown_hours'), p.notification_cooldown_hours, 'notification_cooldown_hours')
+            except ValueError as ve:
+                return jsonify({'error': str(ve)}), 400
+
+            updated = Product(
+                name=data.get('name', p.name),
+                url=url,
+                target_price=target_price,
+                discount_threshold=discount_threshold,
+                selector=data.get('selector', p.selector),
+                enabled=data.get('enabled', p.enabled),
+                notification_cooldown_hours=cooldown_hours,
+                cooldown_mode=p.cooldown_mode
+            )
+            
+            if updated != p:
+                products[i] = updated
+                _write_products_csv(flask_app.config['PRODUCTS_CSV'], products)
             
-            updated = next((pp for pp in products if pp.url == url), None)
             return jsonify({'success': True, 'product': {
                 'name': updated.name,
                 'url': updated.url,
@@ -421,7 +500,7 @@ def create_app():
         """Get products that have hit their price targets or discount thresholds."""
         try:
             products = read_products(flask_app.config['PRODUCTS_CSV'])
-            state = load_state(flask_app.config['STATE_FILE'])
+            state = _load_state(flask_app)
             
             alerts = []
             for p in products:
@@ -460,7 +539,7 @@ def create_app():
                         'last_checked': state_data.get('last_checked')
                     })
             
-            return jsonify(alerts)
+            return _conditional_json(alerts)
         except (OSError, ValueError) as e:
             return jsonify({'error': str(e)}), 500
     
@@ -468,21 +547,14 @@ def create_app():
     def api_export_history():
         """Export all price history as CSV."""
         try:
-            from io import StringIO
-            
-            history = PriceHistory(flask_app.config['HISTORY_DB'])
-            
-            # Stream CSV directly to avoid temp files
-            output = StringIO()
-            history.export_to_csv_stream(output)
-            output.seek(0)
-            
-            return Response(
-                output.getvalue(),
+            # Served from an on-disk snapshot, rebuilt only when the history
+            # changed; send_file hands the bytes to the kernel (or the proxy)
+            return send_file(
+                _history_export_snapshot(flask_app),
                 mimetype='text/csv',
-                headers={
-                    'Content-Disposition': f'attachment; filename=price_history_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
-                }
+                as_attachment=True,
+                download_name=f'price_history_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+                conditional=True
             )
         except (OSError, sqlite3.Error) as e:
             return jsonify({'error': str(e)}), 500
@@ -496,7 +568,7 @@ def create_app():
         """
         try:
             days = int(request.args.get('days', 30))
-            history = PriceHistory(flask_app.config['HISTORY_DB'])
+            history = flask_app.extensions['price_history']
             # Prefer names from current products.csv to avoid stale/incorrect names in DB
             try:
                 current_products = read_products(flask_app.config['PRODUCTS_CSV'])
@@ -506,6 +578,8 @@ def create_app():
 
             # Get list of products that have any history
             products = history.get_all_products()  # List[Tuple[url, name]]
+            # Every product's series in one query rather than one per product
+            series_by_url = history.get_success_series(days=days)
             result = []
             seen_urls = set()
 
@@ -516,7 +590,7 @@ def create_app():
                 # Deduplicate by URL in case DB has multiple names over time
                 if url in seen_urls:
                     continue
-                records = history.get_history(url, days=days)
+                records = series_by_url.get(url)
                 if not records:
                     continue
                 # Choose display name: prefer CSV; else DB unless it looks numeric -> fallback to URL
@@ -531,11 +605,8 @@ def create_app():
                     pass
                 series = [
                     { 'timestamp': ts, 'price': price }
-                    for (ts, price, status) in records
-                    if status == 'success'
+                    for (ts, price) in records
                 ]
-                if not series:
-                    continue
                 result.append({
                     'url': url,
                     'name': display_name,
@@ -550,28 +621,146 @@ def create_app():
     return flask_app
 
 
-def _write_products_csv(filepath, products):
-    """Helper to write products to CSV file."""
-    lock = FileLock(filepath)
-    lock.acquire()
+def _history_export_snapshot(flask_app):
+    """Path of a CSV export of the full history, regenerated if the data changed.
+
+    The snapshot is a full copy kept next to HISTORY_DB so repeat downloads
+    are served straight from disk. PriceHistory.data_version() moves on any
+    commit, from this or another process, so the next request rebuilds it.
+    """
+    history = flask_app.extensions['price_history']
+    export = flask_app.extensions['history_export']
+    path = f"{flask_app.config['HISTORY_DB']}.export.csv"
+    with export['lock']:
+        version = history.data_version()
+        if export['version'] != version or not os.path.exists(path):
+            # Per-process temp name: gunicorn workers may rebuild concurrently
+            tmp = f'{path}.{os.getpid()}.tmp'
+            history.export_to_csv(tmp)
+            os.replace(tmp, path)
+            export['version'] = version
+    return os.path.abspath(path)
+
+
+def _check_price_once(flask_app, product):
+    """Extract product's price for a manual check, collapsing duplicates.
+
+    Returns (price, selector_source, checked_at, fresh). fresh is False when
+    the result was borrowed from a check finished within CHECK_CACHE_SECONDS
+    or one already in flight; only the request that fetched should record it.
+    """
+    checks = flask_app.extensions['manual_checks']
+    url = product.url
+    with checks['lock']:
+        recent = checks['recent'].get(url)
+        if recent is not None and time.monotonic() - recent[0] < flask_app.config['CHECK_CACHE_SECONDS']:
+            return (*recent[1], False)
+        future = checks['pending'].get(url)
+        owner = future is None
+        if owner:
+            future = checks['pending'][url] = Future()
+
+    if not owner:
+        return (*future.result(), False)
+
     try:
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['name', 'url', 'target_price', 'discount_threshold', 'selector', 'enabled', 'notification_cooldown_hours', 'selector_source'])
-            for p in products:
-                writer.writerow([
-                    p.name,
-                    p.url,
-                    p.target_price if p.target_price is not None else '',
-                    p.discount_threshold if p.discount_threshold is not None else '',
-                    p.selector,
-                    'true' if p.enabled else 'false',
-                    p.notification_cooldown_hours,
-                    p.selector_source if p.selector_source else ''
-                ])
-    finally:
-        lock.release()
+        price, selector_source = flask_app.extensions['price_extractor'].extract_price(url, product.selector)
+        result = (price, selector_source, datetime.now(timezone.utc).isoformat())
+    except BaseException as e:
+        with checks['lock']:
+            del checks['pending'][url]
+        future.set_exception(e)
+        raise
+    with checks['lock']:
+        del checks['pending'][url]
+        if price is not None:
+            checks['recent'][url] = (time.monotonic(), result)
+    future.set_result(result)
+    return (*result, True)
+
+
+def _checked_record(prev, price, selector_source, checked_at):
+    """State record after a manual check; prev is the product's previous record, if any."""
+    return {
+        'current_price': price,
+        'last_checked': checked_at,
+        'last_price': prev.get('current_price', price) if prev else price,
+        'selector_source': selector_source
+    }
+
+
+def _index_of(products, url):
+    """Position of the product with url, or None; a single pass over the list."""
+    return next((i for i, p in enumerate(products) if p.url == url), None)
+
 
+def _conditional_json(obj):
+    """JSON response with an ETag; answers 304 when the client's copy is current.
+
+    Dashboard polls mostly see unchanged data, so they get an empty body
+    instead of the full payload.
+    """
+    response = jsonify(obj)
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def _load_state(flask_app):
+    """Load per-product state from the configured backend.
+
+    The JSON backend is cached on file mtime by load_state, so repeated
+    polls don't re-parse an unchanged state file.
+    """
+    store = flask_app.extensions.get('state_store')
+    if store is not None:
+        return store.load()
+    return load_state(flask_app.config['STATE_FILE'])
+
+
+def _save_state(flask_app, changed):
+    """Persist state after the records in changed (url -> record) were updated."""
+    store = flask_app.extensions.get('state_store')
+    if store is not None:
+        store.save(changed)
+    else:
+        # Appends the changed records instead of rewriting the whole snapshot
+        save_state_incremental(flask_app.config['STATE_FILE'], changed)
+
+
+def _write_products_csv(filepath, products):
+    """Helper to write products to CSV file."""
+    rows = (
+        (
+            p.name,
+            p.url,
+            p.target_price if p.target_price is not None else '',
+            p.discount_threshold if p.discount_threshold is not None else '',
+            p.selector,
+            'true' if p.enabled else 'false',
+            p.notification_cooldown_hours,
+            p.selector_source if p.selector_source else '',
+            p.cooldown_mode
+        )
+        for p in products
+    )
+    # Serialize in memory with one writerows call, then hit the file once
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(_PRODUCTS_CSV_HEADER)
+    writer.writerows(rows)
+    data = buf.getvalue().encode('utf-8')
+    directory = os.path.dirname(os.path.abspath(filepath))
+    # The lock serializes concurrent writers; the temp file + rename means
+    # readers (and a crash mid-write) never see a truncated CSV
+    with FileLock(filepath):
+        with NamedTemporaryFile('wb', delete=False, dir=directory, suffix='.tmp') as tmp:
+            try:
+                tmp.write(data)
+            except OSError:
+                tmp.close()
+                os.unlink(tmp.name)
+                raise
+        os.replace(tmp.name, filepath)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,30 @@
+"""
+orjson-backed JSON provider for Flask.
+"""
+from typing import Any, Union
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: Flask's stdlib-json provider is used instead
+    orjson = None
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Encodes jsonify() responses and decodes request bodies with orjson.
+
+    Dates and dataclasses are passed through to Flask's default handler so
+    responses serialize them exactly as before.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get("default", self.default), option=option).decode()
+
+    def loads(self, s: Union[str, bytes], **kwargs: Any) -> Any:
+        return orjson.loads(s)
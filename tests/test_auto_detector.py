@@ -0,0 +1,46 @@
+from sale_monitor.services.auto_detector import PriceAutoDetector
+from sale_monitor.services.html_page import HtmlPage
+
+
+def test_detect_price_prefers_highest_confidence():
+    html = """
+        <span class="price">$5.00</span>
+        <div itemprop="price">$19.99</div>
+        <div class="price__sale"><span class="price-item--sale">$17.99</span></div>
+    """
+    detector = PriceAutoDetector()
+
+    selector, platform, confidence = detector.detect_price(html)
+
+    assert selector == '.price__sale .price-item--sale'
+    assert platform == 'shopify'
+    assert confidence == 0.98
+    assert detector.get_detection_info()['selector'] == selector
+
+
+def test_detect_price_skips_non_price_candidates():
+    html = """
+        <div class="product-price">Regular price $25.00 Sale price $19.99</div>
+        <div class="sale-price">$19.99</div>
+    """
+    selector, platform, confidence = PriceAutoDetector().detect_price(html)
+
+    assert (selector, platform, confidence) == ('.sale-price', 'generic', 0.70)
+
+
+def test_detect_price_not_found():
+    assert PriceAutoDetector().detect_price("<p>No prices here</p>") == ('', '', 0.0)
+
+
+def test_detect_price_memoizes_identical_pages(mocker):
+    html = '<div class="sale-price">$19.99</div>'
+    detector = PriceAutoDetector()
+    scan = mocker.spy(detector, "_detect")
+
+    first = detector.detect_price(html)
+    second = detector.detect_price(html)
+    detector.detect_price(html + "<!-- changed -->")
+
+    assert first == second == ('.sale-price', 'generic', 0.70)
+    assert scan.call_count == 2
+
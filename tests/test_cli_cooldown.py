@@ -2,13 +2,14 @@
 Tests for CLI notification cooldown logic.
 """
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
 import pytest
 
 from sale_monitor.cli.main import main
+from sale_monitor.storage.json_state import load_state, save_state
 
 
 @pytest.fixture
@@ -42,6 +43,48 @@ def write_csv(path: str, products: list):
     )
 
 
+def patch_extractor(mocker):
+    """Patch PriceExtractor; bulk extraction delegates to the mocked extract_price."""
+    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    instance = mock_extractor.return_value
+    instance.extract_prices_bulk.side_effect = (
+        lambda items, *args, **kwargs: [instance.extract_price(url, selector) for url, selector in items]
+    )
+    instance.etag_for.return_value = None
+    return mock_extractor
+
+
+@pytest.fixture
+def cli(mocker):
+    """Patch the CLI's collaborators; returns (extractor, send).
+
+    The extractor finds $95.00 for every product unless a test overrides it.
+    """
+    extractor = patch_extractor(mocker).return_value
+    extractor.extract_price.return_value = (95.0, 'manual')
+    send = mocker.patch("sale_monitor.cli.main.NotificationManager").return_value.send_sale_notification
+    mocker.patch("sale_monitor.cli.main.PriceHistory").return_value.cleanup_old_records.return_value = 0
+    return extractor, send
+
+
+@pytest.fixture
+def run_cli(temp_env):
+    """Return run_cli(now=None, *extra_args), which runs main() once on temp_env's files.
+
+    datetime.now() inside the CLI returns now when it is given.
+    """
+    def run(now=None, *extra_args):
+        argv = ["cli", "--products-csv", temp_env["csv_file"], "--state-file", temp_env["state_file"], *extra_args]
+        with patch("sys.argv", argv):
+            if now is None:
+                return main()
+            with patch("sale_monitor.cli.main.datetime") as mock_dt:
+                mock_dt.now.return_value = now
+                mock_dt.fromisoformat = datetime.fromisoformat
+                return main()
+    return run
+
+
 def test_first_notification_sent(temp_env, mocker):
     """Test that first notification is sent when no prior state exists."""
     # Arrange
@@ -49,7 +92,7 @@ def test_first_notification_sent(temp_env, mocker):
         "Product A,https://example.com/a,100.0,,,true,24"
     ])
     
-    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    mock_extractor = patch_extractor(mocker)
     mock_extractor.return_value.extract_price.return_value = (95.0, 'manual')
     
     mock_notifier = mocker.patch("sale_monitor.cli.main.NotificationManager")
@@ -77,7 +120,7 @@ def test_cooldown_suppression_same_price(temp_env, mocker):
         "Product A,https://example.com/a,100.0,,,true,24"
     ])
     
-    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    mock_extractor = patch_extractor(mocker)
     mock_extractor.return_value.extract_price.return_value = (95.0, 'manual')
     
     mock_notifier = mocker.patch("sale_monitor.cli.main.NotificationManager")
@@ -117,7 +160,7 @@ def test_cooldown_expiry_sends_notification(temp_env, mocker):
         "Product A,https://example.com/a,100.0,,,true,24"
     ])
     
-    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    mock_extractor = patch_extractor(mocker)
     mock_extractor.return_value.extract_price.return_value = (95.0, 'manual')
     
     mock_notifier = mocker.patch("sale_monitor.cli.main.NotificationManager")
@@ -157,7 +200,7 @@ def test_price_drop_during_cooldown_sends_notification(temp_env, mocker):
         "Product A,https://example.com/a,100.0,,,true,24"
     ])
     
-    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    mock_extractor = patch_extractor(mocker)
     mock_notifier = mocker.patch("sale_monitor.cli.main.NotificationManager")
     mock_send = mock_notifier.return_value.send_sale_notification
     
@@ -199,7 +242,7 @@ def test_per_product_cooldown_from_csv(temp_env, mocker):
         "Product A,https://example.com/a,100.0,,,true,1"
     ])
     
-    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    mock_extractor = patch_extractor(mocker)
     mock_extractor.return_value.extract_price.return_value = (95.0, 'manual')
     
     mock_notifier = mocker.patch("sale_monitor.cli.main.NotificationManager")
@@ -250,15 +293,16 @@ def test_multiple_products_independent_cooldowns(temp_env, mocker):
         "Product B,https://example.com/b,100.0,,,true,24",
     ])
     
-    mock_extractor = mocker.patch("sale_monitor.cli.main.PriceExtractor")
+    mock_extractor = patch_extractor(mocker)
     mock_notifier = mocker.patch("sale_monitor.cli.main.NotificationManager")
     mock_send = mock_notifier.return_value.send_sale_notification
     
     mock_history = mocker.patch("sale_monitor.cli.main.PriceHistory")
     mock_history.return_value.cleanup_old_records.return_value = 0
     
-    # Both products at target price
-    mock_extractor.return_value.extract_price.side_effect = [(95.0, 'manual'), (95.0, 'manual')]
+    # Both products at target price (keyed by URL since fetches run concurrently)
+    prices = {"https://example.com/a": 95.0, "https://example.com/b": 95.0}
+    mock_extractor.return_value.extract_price.side_effect = lambda url, selector: (prices[url], 'manual')
     
     base_time = datetime(2025, 10, 30, 12, 0, 0)
     
@@ -273,7 +317,7 @@ def test_multiple_products_independent_cooldowns(temp_env, mocker):
     mock_send.reset_mock()
     
     # Second run - 1 hour later, Product A changes price, Product B same
-    mock_extractor.return_value.extract_price.side_effect = [(85.0, 'manual'), (95.0, 'manual')]
+    prices["https://example.com/a"] = 85.0
     with patch("sale_monitor.cli.main.datetime") as mock_dt:
         mock_dt.now.return_value = base_time + timedelta(hours=1)
         mock_dt.fromisoformat = datetime.fromisoformat
@@ -286,3 +330,182 @@ def test_multiple_products_independent_cooldowns(temp_env, mocker):
     args, kwargs = mock_send.call_args
     assert kwargs["product_name"] == "Product A"
     assert kwargs["current_price"] == 85.0
+
+
+def test_cooldown_with_sqlite_state_backend(temp_env, cli, run_cli):
+    """Test cooldown state persists across runs when stored in the history DB."""
+    _, send = cli
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,,true,24"
+    ])
+    sqlite_args = ("--history-db", str(temp_env["tmp_path"] / "history.db"), "--state-backend", "sqlite")
+
+    run_cli(None, *sqlite_args)
+    assert send.call_count == 1
+
+    # Second run - same price within cooldown
+    assert run_cli(None, *sqlite_args) == 0
+
+    # Assert - suppressed, and no JSON state file was written
+    assert send.call_count == 1
+    assert not Path(temp_env["state_file"]).exists()
+
+
+def test_scheduled_runs_share_one_sqlite_state_store(temp_env, cli, run_cli, mocker):
+    """Test --every opens the SQLite state store once and closes it on exit."""
+    from sale_monitor.cli import main as cli_main
+    from sale_monitor.storage.sqlite_state import SQLiteStateStore
+
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,,true,24"
+    ])
+    store_cls = mocker.patch("sale_monitor.cli.main.SQLiteStateStore", wraps=SQLiteStateStore)
+    close = mocker.spy(SQLiteStateStore, "close")
+    check = mocker.spy(cli_main, "check_prices")
+
+    # One scheduled tick after the immediate run, then stop
+    schedule = mocker.patch("sale_monitor.cli.main.schedule")
+    schedule.idle_seconds.return_value = 0
+    schedule.run_pending.side_effect = lambda: schedule.every.return_value.seconds.do.call_args[0][0]()
+    mocker.patch("sale_monitor.cli.main.signal.signal")
+    mocker.patch("sale_monitor.cli.main.threading.Event").return_value.is_set.side_effect = [False, True]
+
+    assert run_cli(None, "--history-db", str(temp_env["tmp_path"] / "history.db"),
+                   "--state-backend", "sqlite", "--every", "1s") == 0
+
+    assert check.call_count == 2
+    store_cls.assert_called_once()
+    close.assert_called_once()
+
+
+def test_parse_processes_path_drops_stored_etag(temp_env, cli, run_cli, mocker):
+    """Test pages fetched for process-pool parsing don't reuse or keep ETags."""
+    extractor, _ = cli
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,,,.price,true,24"
+    ])
+    save_state(temp_env["state_file"], {"https://example.com/a": {
+        "selector": ".price", "current_price": 100.0, "etag": '"old"',
+    }})
+    extractor.etag_for.return_value = '"old"'
+    mocker.patch("sale_monitor.cli.main._fetch_prices", return_value=[(95.0, 'manual')])
+
+    assert run_cli(None, "--parse-processes", "2") == 0
+
+    extractor.remember_etag.assert_not_called()
+    rec = load_state(temp_env["state_file"])["https://example.com/a"]
+    assert rec["current_price"] == 95.0
+    assert rec["etag"] is None
+
+
+def test_cooldown_honours_legacy_iso_timestamp(temp_env, cli, run_cli):
+    """Test state written before last_notification_sent_ts existed still suppresses."""
+    _, send = cli
+    # Arrange - state with only the ISO string, sent 1 hour before this run
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,,true,24"
+    ])
+    base_time = datetime(2025, 10, 30, 12, 0, 0)
+    save_state(temp_env["state_file"], {"https://example.com/a": {
+        "current_price": 95.0,
+        "last_notification_sent": (base_time - timedelta(hours=1)).isoformat(),
+        "last_notification_price": 95.0,
+    }})
+
+    # Assert - still within the 24h cooldown at the same price
+    assert run_cli(base_time) == 0
+    send.assert_not_called()
+
+    # The parsed time is stored so the next run compares epochs directly
+    rec = load_state(temp_env["state_file"])["https://example.com/a"]
+    assert rec["last_notification_sent_ts"] == (base_time - timedelta(hours=1)).timestamp()
+
+
+def test_parse_processes_fetches_then_parses(temp_env, cli, run_cli):
+    """Test pages fetched in threads are parsed in worker processes."""
+    extractor, send = cli
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,.price,true,24",
+        "Product B,https://example.com/b,100.0,,.price,true,24",
+    ])
+    pages = {
+        "https://example.com/a": '<div class="price">$95.00</div>',
+        "https://example.com/b": None,  # fetch failed
+    }
+    extractor.fetch_html.side_effect = lambda url: pages[url]
+
+    assert run_cli(None, "--parse-processes", "2") == 0
+
+    # Assert - only the fetched product was parsed and notified
+    extractor.extract_price.assert_not_called()
+    send.assert_called_once()
+    args, kwargs = send.call_args
+    assert kwargs["product_name"] == "Product A"
+    assert kwargs["current_price"] == 95.0
+
+
+@pytest.mark.parametrize("elapsed, expected_sends", [
+    (timedelta(hours=24) - timedelta(seconds=1), 0),
+    (timedelta(hours=24), 1),
+])
+def test_cooldown_boundary_is_exactly_cooldown_hours(temp_env, cli, run_cli, elapsed, expected_sends):
+    """Test the cooldown ends exactly cooldown_hours after the last send."""
+    _, send = cli
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,,true,24"
+    ])
+
+    base_time = datetime(2025, 10, 30, 12, 0, 0)
+    run_cli(base_time)
+    run_cli(base_time + elapsed)
+
+    assert send.call_count == 1 + expected_sends
+
+
+def test_future_notification_time_is_clamped(temp_env, cli, run_cli):
+    """Test a send stamped ahead of the local clock doesn't extend the cooldown."""
+    _, send = cli
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,,true,24"
+    ])
+
+    base_time = datetime(2025, 10, 30, 12, 0, 0)
+    # Sent at base_time, then the clock steps back an hour
+    runs = [(base_time, 1), (base_time - timedelta(hours=1), 0), (base_time + timedelta(hours=23), 1)]
+    for now, expected in runs:
+        send.reset_mock()
+        run_cli(now)
+        assert send.call_count == expected
+
+
+@pytest.mark.parametrize("mode, expected_sends", [("rolling", 0), ("calendar_day", 1)])
+def test_calendar_day_cooldown_allows_next_day(temp_env, cli, run_cli, mode, expected_sends):
+    """Test a daily check 23h55m later notifies again only in calendar_day mode."""
+    _, send = cli
+    Path(temp_env["csv_file"]).write_text(
+        "name,url,target_price,discount_threshold,selector,enabled,notification_cooldown_hours,cooldown_mode\n"
+        f"Product A,https://example.com/a,100.0,,,true,24,{mode}\n",
+        encoding="utf-8",
+    )
+
+    # First send two minutes before a UTC midnight; next run lands the next UTC day
+    midnight_utc = datetime(2025, 10, 31, tzinfo=timezone.utc).timestamp()
+    first = datetime.fromtimestamp(midnight_utc - 120)
+    run_cli(first)
+    run_cli(first + timedelta(hours=23, minutes=55))
+
+    assert send.call_count == 1 + expected_sends
+
+
+def test_smtp_session_closed_when_check_loop_fails(temp_env, cli, run_cli, mocker):
+    """Test the notifier's SMTP session is closed even if the check loop raises."""
+    write_csv(temp_env["csv_file"], [
+        "Product A,https://example.com/a,100.0,,,true,24"
+    ])
+    notifier = mocker.patch("sale_monitor.cli.main.NotificationManager").return_value
+    mocker.patch("sale_monitor.cli.main._is_in_cooldown", side_effect=RuntimeError("boom"))
+
+    with pytest.raises(RuntimeError):
+        run_cli()
+
+    notifier.close.assert_called_once()
@@ -0,0 +1,80 @@
+import os
+import time
+from dataclasses import FrozenInstanceError
+
+import pytest
+
+from sale_monitor.storage.csv_products import read_products
+
+
+HEADER = "name,url,target_price,discount_threshold,selector,enabled,notification_cooldown_hours\n"
+
+
+def write_csv(path, rows, age_seconds=60):
+    """Write products CSV and backdate its mtime so it is eligible for caching."""
+    path.write_text(HEADER + "\n".join(rows) + "\n", encoding="utf-8")
+    ts = time.time() - age_seconds
+    os.utime(path, (ts, ts))
+
+
+def test_read_products_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_products(str(tmp_path / "missing.csv"))
+
+
+def test_read_products_cached_list_is_independent(tmp_path):
+    csv_path = tmp_path / "products.csv"
+    write_csv(csv_path, ["Widget,https://example.com/w,10.0,,#price,true,24"])
+
+    first = read_products(str(csv_path))
+    with pytest.raises(FrozenInstanceError):
+        first[0].enabled = False
+    first.clear()
+
+    second = read_products(str(csv_path))
+    assert [p.name for p in second] == ["Widget"]
+    assert second[0].enabled is True
+
+
+def test_read_products_invalidated_on_change(tmp_path):
+    csv_path = tmp_path / "products.csv"
+    write_csv(csv_path, ["Widget,https://example.com/w,10.0,,#price,true,24"])
+    assert [p.name for p in read_products(str(csv_path))] == ["Widget"]
+
+    write_csv(
+        csv_path,
+        [
+            "Widget,https://example.com/w,10.0,,#price,true,24",
+            "Gadget,https://example.com/g,,,#price,false,12",
+        ],
+        age_seconds=30,
+    )
+    products = read_products(str(csv_path))
+    assert [p.name for p in products] == ["Widget", "Gadget"]
+    assert products[1].enabled is False
+
+
+def test_read_products_optional_columns_and_column_order(tmp_path):
+    csv_path = tmp_path / "products.csv"
+    csv_path.write_text(
+        "url,selector_source,name,cooldown_mode\n"
+        "https://example.com/w,auto,Widget,calendar_day\n"
+        "\n"
+        "https://example.com/g,,Gadget,bogus\n",
+        encoding="utf-8",
+    )
+
+    products = read_products(str(csv_path))
+
+    assert [(p.name, p.url) for p in products] == [
+        ("Widget", "https://example.com/w"),
+        ("Gadget", "https://example.com/g"),
+    ]
+    assert products[0].selector == ""
+    assert products[0].selector_source == "auto"
+    assert products[1].selector_source is None
+    assert products[0].enabled is True
+    assert products[0].notification_cooldown_hours == 24
+    assert products[0].target_price is None
+    assert products[0].cooldown_mode == "calendar_day"
+    assert products[1].cooldown_mode == "rolling"
@@ -0,0 +1,32 @@
+import threading
+import time
+
+from sale_monitor.storage.file_lock import FileLock
+
+
+def test_lock_blocks_second_holder_until_release(tmp_path):
+    target = str(tmp_path / "products.csv")
+    events = []
+
+    def contender():
+        with FileLock(target):
+            events.append("contender")
+
+    with FileLock(target):
+        thread = threading.Thread(target=contender)
+        thread.start()
+        time.sleep(0.2)
+        events.append("holder")
+    thread.join(timeout=5)
+
+    assert events == ["holder", "contender"]
+
+
+def test_stale_lock_file_does_not_block(tmp_path):
+    target = tmp_path / "products.csv"
+    (tmp_path / "products.csv.lock").write_text("")  # left behind by a crashed process
+
+    lock = FileLock(str(target))
+    lock.acquire()
+    lock.release()
+    assert lock.lock_fd is None
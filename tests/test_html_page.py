@@ -0,0 +1,43 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from sale_monitor.services import html_page
+from sale_monitor.services.html_page import HtmlPage
+
+HTML = """
+<div class="product price"><span class="money" data-price="1999">$19.99</span></div>
+<p id="price">$21.00</p>
+<meta itemprop="price" content="19.99"><span itemprop="price">$18.00</span>
+<b data-price-type="finalPrice">$17.50</b>
+"""
+
+
+@pytest.mark.parametrize("selector", [
+    ".price", "span.money", "SPAN.money", "#price", "[data-price]",
+    '[itemprop="price"]', '[data-price-type="finalPrice"]', "b", ".product .money",
+])
+def test_soup_fallback_matches_soupsieve(monkeypatch, selector):
+    monkeypatch.setattr(html_page, "LexborHTMLParser", None)
+    expected = [el.get_text(strip=True) for el in BeautifulSoup(HTML, "html.parser").select(selector)]
+
+    assert list(HtmlPage(HTML).iter_texts(selector)) == expected
+
+
+@pytest.mark.parametrize("selector", [".price", "span.money", "#price", "[data-price]", '[itemprop="price"]'])
+def test_soup_fallback_answers_simple_selectors_with_find_all(monkeypatch, mocker, selector):
+    monkeypatch.setattr(html_page, "LexborHTMLParser", None)
+    select = mocker.spy(BeautifulSoup, "select")
+    find_all = mocker.spy(BeautifulSoup, "find_all")
+
+    list(HtmlPage(HTML).iter_texts(selector))
+
+    select.assert_not_called()
+    assert find_all.called
+
+
+def test_soup_fallback_sends_compound_selectors_to_select(monkeypatch, mocker):
+    monkeypatch.setattr(html_page, "LexborHTMLParser", None)
+    select = mocker.spy(BeautifulSoup, "select")
+
+    assert list(HtmlPage(HTML).iter_texts(".product .money")) == ["$19.99"]
+    select.assert_called_once()
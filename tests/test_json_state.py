@@ -1,7 +1,7 @@
 import json
 from pathlib import Path
 import pytest
-from sale_monitor.storage.json_state import load_state, save_state
+from sale_monitor.storage.json_state import load_state, save_state, save_state_incremental
 
 
 def test_load_state_missing_file():
@@ -79,8 +79,20 @@ def test_save_state_overwrites_existing(tmp_path):
     assert "old" not in loaded
 
 
-def test_save_state_json_formatting(tmp_path):
-    """Test that saved JSON is properly formatted (indented, sorted)."""
+def test_save_state_compact_by_default(tmp_path, monkeypatch):
+    """Test that saved JSON is compact unless pretty output is requested."""
+    monkeypatch.delenv("SALE_MONITOR_PRETTY_STATE", raising=False)
+    file_path = tmp_path / "state.json"
+
+    save_state(str(file_path), {"b": {"name": "Café", "price": 1.5}, "a": {}})
+
+    content = file_path.read_text(encoding="utf-8")
+    assert content == '{"b":{"name":"Café","price":1.5},"a":{}}'
+
+
+def test_save_state_json_formatting(tmp_path, monkeypatch):
+    """Test that saved JSON is properly formatted (indented, sorted) when enabled."""
+    monkeypatch.setenv("SALE_MONITOR_PRETTY_STATE", "true")
     file_path = tmp_path / "state.json"
     test_data = {"z_key": "last", "a_key": "first", "m_key": "middle"}
     
@@ -94,4 +106,98 @@ def test_save_state_json_formatting(tmp_path):
     assert "  " in content  # 2-space indent
     
     # Verify keys are sorted (a_key should appear before z_key)
-    assert content.index("a_key") < content.index("z_key")
\ No newline at end of file
+    assert content.index("a_key") < content.index("z_key")
+
+
+def test_save_state_incremental_appends_and_replays(tmp_path):
+    """Test incremental saves append to the log and are replayed on load."""
+    file_path = tmp_path / "state.json"
+    log_path = tmp_path / "state.json.log"
+    save_state(str(file_path), {"a": {"current_price": 1.0}, "b": {"current_price": 2.0}})
+    snapshot = file_path.read_text(encoding="utf-8")
+
+    state = load_state(str(file_path))
+    state["b"] = {"current_price": 3.0}
+    save_state_incremental(str(file_path), {"b": state["b"]})
+
+    # Snapshot untouched, change lives in the log
+    assert file_path.read_text(encoding="utf-8") == snapshot
+    assert log_path.exists()
+    assert load_state(str(file_path)) == {"a": {"current_price": 1.0}, "b": {"current_price": 3.0}}
+
+    # A full save folds the log back into the snapshot
+    save_state(str(file_path), load_state(str(file_path)))
+    assert not log_path.exists()
+    assert load_state(str(file_path))["b"]["current_price"] == 3.0
+
+
+def test_save_state_incremental_without_snapshot(tmp_path):
+    """Test the first incremental save writes a full snapshot."""
+    file_path = tmp_path / "state.json"
+    state = {"a": {"current_price": 1.0}}
+
+    save_state_incremental(str(file_path), state)
+
+    assert file_path.exists()
+    assert not (tmp_path / "state.json.log").exists()
+    assert load_state(str(file_path)) == state
+
+
+def test_load_state_skips_torn_log_line(tmp_path):
+    """Test a partially written log line is ignored."""
+    file_path = tmp_path / "state.json"
+    save_state(str(file_path), {"a": 1})
+    (tmp_path / "state.json.log").write_text('{"k": "b", "v": 2}\n{"k": "c", "v"', encoding="utf-8")
+
+    assert load_state(str(file_path)) == {"a": 1, "b": 2}
+
+def test_append_after_torn_log_line_keeps_record(tmp_path):
+    """Test a record appended after an interrupted append starts on its own line."""
+    file_path = tmp_path / "state.json"
+    save_state(str(file_path), {"a": 1})
+    (tmp_path / "state.json.log").write_text('{"k": "b", "v": 2}\n{"k": "c", "v"', encoding="utf-8")
+
+    save_state_incremental(str(file_path), {"d": 4})
+
+    assert load_state(str(file_path)) == {"a": 1, "b": 2, "d": 4}
+
+
+def test_compaction_keeps_records_appended_by_another_process(tmp_path, monkeypatch):
+    """Test compaction merges the log on disk rather than the caller's loaded state."""
+    from sale_monitor.storage import json_state
+
+    file_path = tmp_path / "state.json"
+    save_state(str(file_path), {})
+    # Another process appends after this one loaded its (now stale) state
+    save_state_incremental(str(file_path), {"other": {"current_price": 2.0}})
+
+    monkeypatch.setattr(json_state, "_MIN_COMPACT_BYTES", 0)
+    save_state_incremental(str(file_path), {"mine": {"current_price": 1.0}})
+
+    assert not (tmp_path / "state.json.log").exists()
+    assert load_state(str(file_path)) == {
+        "other": {"current_price": 2.0},
+        "mine": {"current_price": 1.0},
+    }
+
+
+def test_load_state_cached_until_files_change(tmp_path, mocker):
+    """Test unchanged state files are served from cache as independent copies."""
+    import os
+    import time
+    from sale_monitor.storage import json_state
+
+    file_path = tmp_path / "state.json"
+    save_state(str(file_path), {"u": {"current_price": 10.0}})
+    old = time.time() - 60
+    os.utime(file_path, (old, old))
+
+    read = mocker.spy(json_state, "_read_state")
+    first = load_state(str(file_path))
+    first["u"]["current_price"] = 1.0
+    first["new"] = {}
+    assert load_state(str(file_path)) == {"u": {"current_price": 10.0}}
+    assert read.call_count == 1
+
+    save_state_incremental(str(file_path), {"u": first["u"]})
+    assert load_state(str(file_path))["u"]["current_price"] == 1.0
@@ -0,0 +1,24 @@
+import pytest
+
+from sale_monitor.storage import json_store
+from sale_monitor.storage.json_store import JSONStore
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_save_and_load_round_trip(tmp_path, monkeypatch, use_orjson):
+    if use_orjson:
+        if json_store.orjson is None:
+            pytest.skip("orjson not installed")
+    else:
+        monkeypatch.setattr(json_store, "orjson", None)
+    store = JSONStore(str(tmp_path / "products.json"))
+    products = [
+        {"name": "Café crème", "url": "https://example.com/café", "target_price": 9.5, "enabled": True},
+        {"name": "東京 Widget", "url": "https://example.com/w", "target_price": None, "enabled": False},
+    ]
+
+    assert store.load_products() == []
+    store.save_products(products)
+
+    assert store.load_products() == products
+    assert JSONStore(store.file_path).load_products() == products
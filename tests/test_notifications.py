@@ -1,3 +1,5 @@
+import smtplib
+
 from sale_monitor.services.notifications import NotificationManager, SmtpConfig
 
 
@@ -20,9 +22,7 @@ def test_send_email_uses_starttls_and_login(mocker):
     notifier = NotificationManager(cfg)
 
     mock_smtp_cls = mocker.patch("smtplib.SMTP", autospec=True)
-    smtp_cm = mock_smtp_cls.return_value
-    server = mocker.MagicMock()
-    smtp_cm.__enter__.return_value = server
+    server = mock_smtp_cls.return_value
 
     # Act
     notifier.send_sale_notification(
@@ -34,7 +34,7 @@ def test_send_email_uses_starttls_and_login(mocker):
         triggered_by="target_price",
     )
 
-    # Assert: context manager called
+    # Assert: connection opened
     mock_smtp_cls.assert_called_once_with("smtp.example.com", 587, timeout=30)
     server.starttls.assert_called_once()
     server.login.assert_called_once_with("user@example.com", "secret")
@@ -49,6 +49,8 @@ def test_send_email_uses_starttls_and_login(mocker):
     assert "Subject: Sale Monitor: Test Product at $123.45" in raw_msg
     assert "Product: Test Product" in raw_msg
     assert "URL: https://example.com/p/1" in raw_msg
+    assert "Content-Type: text/plain" in raw_msg
+    assert "multipart" not in raw_msg
 
 
 def test_send_email_without_starttls(mocker):
@@ -57,9 +59,7 @@ def test_send_email_without_starttls(mocker):
     notifier = NotificationManager(cfg)
 
     mock_smtp_cls = mocker.patch("smtplib.SMTP", autospec=True)
-    smtp_cm = mock_smtp_cls.return_value
-    server = mocker.MagicMock()
-    smtp_cm.__enter__.return_value = server
+    server = mock_smtp_cls.return_value
 
     # Act
     notifier.send_sale_notification(
@@ -92,4 +92,34 @@ def test_send_email_disabled_does_nothing(mocker):
     )
 
     # Assert: SMTP never instantiated
-    mock_smtp_cls.assert_not_called()
\ No newline at end of file
+    mock_smtp_cls.assert_not_called()
+
+
+def test_session_reused_across_notifications_until_close(mocker):
+    notifier = NotificationManager(make_cfg())
+    mock_smtp_cls = mocker.patch("smtplib.SMTP", autospec=True)
+    server = mock_smtp_cls.return_value
+
+    notifier.send_sale_notification("A", "https://example.com/a", 10.0)
+    notifier.send_sale_notification("B", "https://example.com/b", 20.0)
+    notifier.close()
+
+    mock_smtp_cls.assert_called_once()
+    server.login.assert_called_once()
+    assert server.sendmail.call_count == 2
+    server.quit.assert_called_once()
+
+
+def test_reconnects_when_server_dropped_session(mocker):
+    notifier = NotificationManager(make_cfg())
+    mock_smtp_cls = mocker.patch("smtplib.SMTP", autospec=True)
+    stale, fresh = mocker.MagicMock(), mocker.MagicMock()
+    stale.sendmail.side_effect = [None, smtplib.SMTPServerDisconnected()]
+    mock_smtp_cls.side_effect = [stale, fresh]
+
+    notifier.send_sale_notification("A", "https://example.com/a", 10.0)
+    notifier.send_sale_notification("B", "https://example.com/b", 20.0)
+
+    assert mock_smtp_cls.call_count == 2
+    fresh.login.assert_called_once()
+    fresh.sendmail.assert_called_once()
@@ -1,5 +1,5 @@
 import pytest
-from sale_monitor.services.price_extractor import PriceExtractor
+from sale_monitor.services.price_extractor import PriceExtractor, extract_price_from_html
 
 class TestPriceExtractor:
     @pytest.fixture
@@ -25,6 +25,59 @@ class TestPriceExtractor:
         assert price == 19.99
         assert source == 'auto'
 
+    def test_extract_price_soupsieve_only_selector(self, price_extractor, requests_mock):
+        url = "http://example.com/product"
+        selector = 'span:-soup-contains("Now")'
+        requests_mock.get(url, text='<span>Was $25.00</span><span>Now $19.99</span>')
+
+        price, source = price_extractor.extract_price(url, selector)
+        assert price == 19.99
+        assert source == 'manual'
+
+    def test_extract_price_not_modified_reuses_cached_result(self, price_extractor, requests_mock):
+        url = "http://example.com/product"
+        adapter = requests_mock.get(url, [
+            {"text": '<div class="price">$19.99</div>', "headers": {"ETag": '"v1"'}},
+            {"status_code": 304},
+        ])
+
+        assert price_extractor.extract_price(url, ".price") == (19.99, 'manual')
+        assert price_extractor.extract_price(url, ".price") == (19.99, 'manual')
+        assert adapter.call_count == 2
+        assert "If-None-Match" not in adapter.request_history[0].headers
+        assert adapter.request_history[1].headers["If-None-Match"] == '"v1"'
+
+    def test_remembered_etag_skips_download(self, price_extractor, requests_mock):
+        url = "http://example.com/product"
+        adapter = requests_mock.get(url, status_code=304)
+
+        price_extractor.remember_etag(url, '"v1"', ".price", (19.99, 'manual'))
+
+        assert price_extractor.extract_price(url, ".price") == (19.99, 'manual')
+        assert adapter.request_history[0].headers["If-None-Match"] == '"v1"'
+        assert price_extractor.etag_for(url) == '"v1"'
+
+    def test_extract_prices_bulk_preserves_order_and_isolates_errors(self, price_extractor, requests_mock, mocker):
+        requests_mock.get("http://example.com/a", text='<div class="price">$1.00</div>')
+        requests_mock.get("http://example.com/b", text='<div class="price">$2.00</div>')
+        mocker.patch.object(price_extractor, "max_retries", 1)
+        real = price_extractor.extract_price
+
+        def flaky(url, selector):
+            if url.endswith("/boom"):
+                raise ValueError("boom")
+            return real(url, selector)
+
+        mocker.patch.object(price_extractor, "extract_price", side_effect=flaky)
+
+        results = price_extractor.extract_prices_bulk([
+            ("http://example.com/b", ".price"),
+            ("http://example.com/boom", ".price"),
+            ("http://example.com/a", ".price"),
+        ], max_workers=3)
+
+        assert results == [(2.0, 'manual'), (None, ""), (1.0, 'manual')]
+
     def test_extract_price_request_failure(self, price_extractor, requests_mock):
         url = "http://example.com/product"
         selector = ".price"
@@ -38,8 +91,48 @@ class TestPriceExtractor:
         assert price_extractor._parse_price("$19.99") == 19.99
         assert price_extractor._parse_price("€19,99") == 19.99
         assert price_extractor._parse_price("£1,234.56") == 1234.56
+        assert price_extractor._parse_price("1.234,56 €") == 1234.56
+        assert price_extractor._parse_price("$1,234,567") == 1234567.0
+        assert price_extractor._parse_price("1.234.567,89") == 1234567.89
+        assert price_extractor._parse_price(".99") == 0.99
+        assert price_extractor._parse_price("$.99") == 0.99
+        assert price_extractor._parse_price("19.99.") == 19.99
 
     def test_parse_price_invalid(self, price_extractor):
         assert price_extractor._parse_price("invalid") is None
         assert price_extractor._parse_price("") is None
-        assert price_extractor._parse_price("N/A") is None
\ No newline at end of file
+        assert price_extractor._parse_price("N/A") is None
+
+def test_extract_price_from_html():
+    html = '<div class="price">$19.99</div>'
+    assert extract_price_from_html(html, ".price") == (19.99, 'manual')
+    assert extract_price_from_html(html) == (19.99, 'auto')
+    assert extract_price_from_html("<p>nothing here</p>", ".price") == (None, "")
+
+
+def test_extract_prices_bulk_limits_requests_per_host(mocker):
+    import threading
+    import time
+
+    extractor = PriceExtractor(user_agent="test-agent")
+    lock = threading.Lock()
+    active = {}
+    peak = {}
+
+    def slow(url, selector):
+        host = url.split("/")[2]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        time.sleep(0.02)
+        with lock:
+            active[host] -= 1
+        return 1.0, 'manual'
+
+    mocker.patch.object(extractor, "extract_price", side_effect=slow)
+    items = [(f"http://{host}/{i}", "") for host in ("a.test", "b.test") for i in range(6)]
+
+    results = extractor.extract_prices_bulk(items, max_workers=8, max_per_host=2)
+
+    assert results == [(1.0, 'manual')] * 12
+    assert peak == {"a.test": 2, "b.test": 2}
@@ -1,6 +1,7 @@
 """
 Tests for price history storage.
 """
+import sqlite3
 from datetime import datetime, timedelta
 from sale_monitor.storage.price_history import PriceHistory
 
@@ -25,6 +26,24 @@ def test_record_and_retrieve_price(tmp_path):
     assert status == "success"
 
 
+def test_record_prices_bulk(tmp_path):
+    """Test recording several prices in one call."""
+    db_path = tmp_path / "test_history.db"
+    history = PriceHistory(str(db_path))
+
+    inserted = history.record_prices_bulk([
+        ("https://example.com/a", "Product A", 10.0),
+        ("https://example.com/b", "Product B", 20.0),
+    ])
+    assert inserted == 2
+    assert history.record_prices_bulk([]) == 0
+
+    records = history.get_history("https://example.com/b")
+    assert len(records) == 1
+    assert records[0][1] == 20.0
+    assert records[0][2] == "success"
+
+
 def test_get_all_products(tmp_path):
     """Test listing all products with history."""
     db_path = tmp_path / "test_history.db"
@@ -53,6 +72,7 @@ def test_get_price_changes(tmp_path):
     history.record_price(url, "Product", 100.0, (base_time - timedelta(days=3)).isoformat())
     history.record_price(url, "Product", 100.0, (base_time - timedelta(days=2)).isoformat())
     history.record_price(url, "Product", 90.0, (base_time - timedelta(days=1)).isoformat())
+    history.record_price(url, "Product", 0.0, (base_time - timedelta(hours=12)).isoformat(), status="failed")
     history.record_price(url, "Product", 85.0, base_time.isoformat())
     
     changes = history.get_price_changes(url)
@@ -65,6 +85,26 @@ def test_get_price_changes(tmp_path):
     assert changes[1][2] == 90.0
 
 
+def test_get_history_buckets(tmp_path):
+    """Test successful checks are averaged per UTC hour/day bucket, newest first."""
+    import pytest
+
+    history = PriceHistory(str(tmp_path / "test_history.db"))
+    url = "https://example.com/product"
+    history.record_price(url, "Product", 10.0, "2024-01-01T10:05:00+00:00")
+    history.record_price(url, "Product", 20.0, "2024-01-01T10:55:00+00:00")
+    history.record_price(url, "Product", 99.0, "2024-01-01T10:56:00+00:00", status="failed")
+    history.record_price(url, "Product", 30.0, "2024-01-02T01:00:00+02:00")  # 2024-01-01T23:00Z
+
+    assert history.get_history_buckets(url, "hour") == [
+        ("2024-01-01T23:00:00+00:00", 30.0, "success"),
+        ("2024-01-01T10:00:00+00:00", 15.0, "success"),
+    ]
+    assert history.get_history_buckets(url, "day") == [("2024-01-01T00:00:00+00:00", 20.0, "success")]
+    with pytest.raises(ValueError):
+        history.get_history_buckets(url, "week")
+
+
 def test_cleanup_old_records(tmp_path):
     """Test cleaning up old history records."""
     db_path = tmp_path / "test_history.db"
@@ -87,6 +127,21 @@ def test_cleanup_old_records(tmp_path):
     assert len(records) == 2
 
 
+def test_cleanup_old_records_in_batches(tmp_path, monkeypatch):
+    """Test cleanup deletes across several bounded batches."""
+    from sale_monitor.storage import price_history
+
+    monkeypatch.setattr(price_history, "_DELETE_BATCH_SIZE", 2)
+    history = PriceHistory(str(tmp_path / "test_history.db"))
+    url = "https://example.com/product"
+    old = (datetime.now() - timedelta(days=100)).isoformat()
+    history.record_prices_bulk([(url, "Product", float(i)) for i in range(5)], timestamp=old)
+    history.record_price(url, "Product", 1.0)
+
+    assert history.cleanup_old_records(60) == 5
+    assert len(history.get_history(url)) == 1
+
+
 def test_get_stats(tmp_path):
     """Test price statistics calculation."""
     db_path = tmp_path / "test_history.db"
@@ -98,6 +153,7 @@ def test_get_stats(tmp_path):
     history.record_price(url, "Product", 100.0)
     history.record_price(url, "Product", 80.0)
     history.record_price(url, "Product", 120.0)
+    history.record_price(url, "Product", 0.0, status="failed")
     
     stats = history.get_stats(url)
     
@@ -105,7 +161,7 @@ def test_get_stats(tmp_path):
     assert stats["max_price"] == 120.0
     assert stats["avg_price"] == 100.0
     assert stats["checks_count"] == 3
-    assert "current_price" in stats
+    assert stats["current_price"] == 120.0
     assert "first_check" in stats
     assert "last_check" in stats
 
@@ -128,6 +184,78 @@ def test_history_with_days_filter(tmp_path):
     assert len(records) == 2  # Should exclude the 10-day-old record
 
 
+def test_history_keyset_pagination(tmp_path):
+    """Test paging through history with the before cursor."""
+    db_path = tmp_path / "test_history.db"
+    history = PriceHistory(str(db_path))
+
+    url = "https://example.com/product"
+    now = datetime.now()
+    for i in range(5):
+        history.record_price(url, "Product", 100.0 + i, (now - timedelta(hours=i)).isoformat())
+
+    page1 = history.get_history(url, limit=2)
+    page2 = history.get_history(url, limit=2, before=page1[-1][0])
+    page3 = history.get_history(url, limit=2, before=page2[-1][0])
+
+    assert [price for _, price, _ in page1] == [100.0, 101.0]
+    assert [price for _, price, _ in page2] == [102.0, 103.0]
+    assert [price for _, price, _ in page3] == [104.0]
+
+
+def test_history_query_uses_covering_index(tmp_path):
+    """Test per-product history is served from the covering index."""
+    import sqlite3
+
+    db_path = tmp_path / "test_history.db"
+    PriceHistory(str(db_path))
+
+    with sqlite3.connect(str(db_path)) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT timestamp, price, check_status FROM price_history "
+            "WHERE product_url = ? AND timestamp >= ? ORDER BY timestamp DESC LIMIT 100",
+            ("https://example.com/product", "2025-01-01"),
+        ).fetchall()
+    detail = " ".join(row[-1] for row in plan)
+    assert "COVERING INDEX idx_product_url_ts" in detail
+
+
+def test_connections_use_wal_and_tuned_pragmas(tmp_path):
+    """Test the database is in WAL mode and connections relax fsync to NORMAL."""
+    history = PriceHistory(str(tmp_path / "test_history.db"))
+
+    with history._read() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -8000
+
+
+def test_connections_are_reused_across_calls_and_threads(tmp_path):
+    """Test one PriceHistory serves calls from several threads on pooled connections."""
+    import threading
+
+    history = PriceHistory(str(tmp_path / "test_history.db"))
+    url = "https://example.com/product"
+
+    threads = [
+        threading.Thread(target=history.record_price, args=(url, "Test Product", float(i)))
+        for i in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with history._read() as first:
+        pass
+    assert len(history.get_history(url)) == 8
+    with history._read() as second:
+        assert second is first
+
+    history.close()
+
+
 def test_export_to_csv(tmp_path):
     """Test CSV export functionality."""
     db_path = tmp_path / "test_history.db"
@@ -148,3 +276,66 @@ def test_export_to_csv(tmp_path):
     assert "Product B" in content
     assert "10.0" in content
     assert "20.0" in content
+
+
+def test_reads_cached_until_table_changes(tmp_path, mocker):
+    db_path = str(tmp_path / "test_history.db")
+    history = PriceHistory(db_path)
+    url = "https://example.com/a"
+    history.record_price(url, "Product A", 10.0)
+    query = mocker.spy(history, "_query_stats")
+
+    assert history.get_stats(url)["current_price"] == 10.0
+    history.get_stats(url)["current_price"] = -1  # callers get their own copy
+    assert history.get_stats(url)["current_price"] == 10.0
+    assert query.call_count == 1
+
+    # Local write
+    history.record_price(url, "Product A", 9.0)
+    assert history.get_stats(url)["current_price"] == 9.0
+
+    # Row inserted by another process
+    PriceHistory(db_path).record_price(url, "Product A", 8.0)
+    assert history.get_stats(url)["current_price"] == 8.0
+    assert [p for _, p, _ in history.get_history(url)] == [8.0, 9.0, 10.0]
+    assert query.call_count == 3
+
+    # Update and delete by another process, with no new row
+    other = sqlite3.connect(db_path)
+    with other:
+        other.execute("UPDATE price_history SET price = 7.0 WHERE price = 8.0")
+    assert history.get_stats(url)["current_price"] == 7.0
+    with other:
+        other.execute("DELETE FROM price_history")
+    assert history.get_stats(url) == {}
+    other.close()
+
+
+def test_get_success_series_groups_by_product(tmp_path):
+    history = PriceHistory(str(tmp_path / "test_history.db"))
+    history.record_price("https://example.com/a", "A", 10.0, timestamp="2024-01-01T00:00:00")
+    history.record_price("https://example.com/b", "B", 20.0, timestamp="2024-01-01T00:00:00")
+    history.record_price("https://example.com/a", "A", 0.0, timestamp="2024-01-02T00:00:00", status="failed")
+    history.record_price("https://example.com/a", "A", 9.0, timestamp="2024-01-03T00:00:00")
+
+    assert history.get_success_series() == {
+        "https://example.com/a": [("2024-01-03T00:00:00", 9.0), ("2024-01-01T00:00:00", 10.0)],
+        "https://example.com/b": [("2024-01-01T00:00:00", 20.0)],
+    }
+    assert history.get_success_series(days=1) == {}
+
+
+def test_in_memory_history_shared_across_pooled_connections():
+    history = PriceHistory(":memory:")
+    other = PriceHistory(":memory:")
+    url = "https://example.com/a"
+    history.record_price(url, "Product A", 10.0)
+
+    with history._read() as conn:
+        (count,) = conn.execute("SELECT COUNT(*) FROM price_history").fetchone()
+    assert count == 1
+    assert history.get_stats(url)["current_price"] == 10.0
+    assert other.get_history(url) == []
+
+    history.close()
+    other.close()
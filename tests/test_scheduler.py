@@ -0,0 +1,41 @@
+import threading
+import time
+
+from sale_monitor.services.scheduler import Scheduler
+
+
+def test_stop_wakes_idle_scheduler():
+    calls = []
+    scheduler = Scheduler(interval_minutes=60, check_function=lambda: calls.append(1))
+
+    thread = threading.Thread(target=scheduler.start)
+    thread.start()
+    time.sleep(0.1)
+
+    started = time.monotonic()
+    scheduler.stop()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - started < 1
+    assert calls == []
+
+
+def test_run_once_calls_check_function():
+    calls = []
+    Scheduler(interval_minutes=1, check_function=lambda: calls.append(1)).run_once()
+    assert calls == [1]
+
+
+def test_runs_check_function_each_interval():
+    calls = []
+    scheduler = Scheduler(interval_minutes=0.001, check_function=lambda: calls.append(time.monotonic()))
+
+    thread = threading.Thread(target=scheduler.start)
+    thread.start()
+    time.sleep(0.35)
+    scheduler.stop()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert 2 <= len(calls) <= 7
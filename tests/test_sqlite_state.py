@@ -0,0 +1,56 @@
+import sqlite3
+
+from sale_monitor.storage.json_state import save_state
+from sale_monitor.storage.sqlite_state import SQLiteStateStore
+
+
+def test_save_and_load(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "history.db"))
+    store.save({"https://example.com/a": {"current_price": 10.0}})
+    store.save({"https://example.com/b": {"current_price": 20.0}})
+
+    # Upsert replaces only the given record
+    store.save({"https://example.com/a": {"current_price": 9.0}})
+
+    assert store.load() == {
+        "https://example.com/a": {"current_price": 9.0},
+        "https://example.com/b": {"current_price": 20.0},
+    }
+    assert store.get("https://example.com/b") == {"current_price": 20.0}
+    assert store.get("https://example.com/missing") == {}
+
+
+def test_delete_and_clear(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / "history.db"))
+    store.save({"a": {"current_price": 1.0}, "b": {"current_price": 2.0}})
+
+    store.delete("a")
+    assert list(store.load()) == ["b"]
+
+    store.clear()
+    assert store.load() == {}
+
+
+def test_imports_state_json_once(tmp_path):
+    state_file = tmp_path / "state.json"
+    db_path = str(tmp_path / "history.db")
+    save_state(str(state_file), {"https://example.com/a": {"current_price": 10.0}})
+
+    store = SQLiteStateStore(db_path, import_from=str(state_file))
+    assert store.get("https://example.com/a") == {"current_price": 10.0}
+
+    # Later runs keep DB state even if the JSON file differs
+    store.save({"https://example.com/a": {"current_price": 8.0}})
+    store = SQLiteStateStore(db_path, import_from=str(state_file))
+    assert store.get("https://example.com/a") == {"current_price": 8.0}
+
+
+def test_reuses_one_connection(tmp_path, mocker):
+    connect = mocker.spy(sqlite3, "connect")
+    store = SQLiteStateStore(str(tmp_path / "history.db"))
+    store.save({"a": {"current_price": 1.0}})
+    store.load()
+    store.get("a")
+    store.close()
+
+    assert connect.call_count == 1
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from sale_monitor.storage.sqlite_store import SQLiteStore
+
+
+def make_product(name, **overrides):
+    product = {
+        "name": name,
+        "url": f"https://example.com/{name.lower()}",
+        "target_price": 10.0,
+        "current_price": None,
+        "discount_threshold": 5.0,
+        "selector": ".price",
+        "enabled": 1,
+        "last_checked": None,
+        "last_price": None,
+        "last_notification_sent": None,
+        "last_notification_price": None,
+        "notification_cooldown_hours": 24,
+    }
+    product.update(overrides)
+    return product
+
+
+def test_save_products_round_trip(tmp_path):
+    store = SQLiteStore(str(tmp_path / "products.db"))
+    products = [make_product("Widget"), make_product("Gadget", target_price=None, enabled=0)]
+
+    store.save_products(products)
+
+    loaded = store.load_products()
+    assert [p.pop("id") for p in loaded] == [1, 2]
+    assert loaded == products
+
+
+def test_save_products_rolls_back_batch_on_bad_row(tmp_path):
+    store = SQLiteStore(str(tmp_path / "products.db"))
+    store.save_product(make_product("Existing"))
+
+    # discount_threshold is NOT NULL, so the second row fails the insert
+    with pytest.raises(sqlite3.IntegrityError):
+        store.save_products([make_product("Widget"), make_product("Broken", discount_threshold=None)])
+
+    assert [p["name"] for p in store.load_products()] == ["Existing"]
+
+
+def test_threads_use_their_own_connections(tmp_path):
+    import threading
+
+    store = SQLiteStore(str(tmp_path / "products.db"))
+    connections = {}
+    errors = []
+
+    def worker(name):
+        try:
+            store.save_product(make_product(name))
+            assert name in [p["name"] for p in store.load_products()]
+            connections[name] = store.connection
+            store.close()
+            # A closed connection is replaced on next use
+            assert store.connection is not connections[name]
+            store.close()
+        except Exception as e:  # surfaced in the main thread below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ("Widget", "Gadget")]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert connections["Widget"] is not connections["Gadget"]
+    assert connections["Widget"] is not store.connection
+    assert sorted(p["name"] for p in store.load_products()) == ["Gadget", "Widget"]
+
+    # Closed connections refuse further use
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections["Widget"].execute("SELECT 1")
@@ -1,18 +1,27 @@
+import csv
+import io
 import os
+import sqlite3
 from unittest.mock import patch
 
+import pytest
+
+from sale_monitor.services.price_extractor import PriceExtractor
+from sale_monitor.storage.json_state import save_state
+
 
 HEADER = "name,url,target_price,discount_threshold,selector,enabled,notification_cooldown_hours\n"
+HEADER_BYTES = HEADER.encode("ascii")
 
 
 def write_products_csv(path, rows):
-    lines = [
-        ",".join(map(lambda v: "" if v is None else str(v), r)) for r in rows
-    ]
-    path.write_text(HEADER + "\n".join(lines) + "\n", encoding="utf-8")
+    # csv.writer quotes values containing commas or quotes, which a plain join would not
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(["" if v is None else v for v in r] for r in rows)
+    path.write_bytes(HEADER_BYTES + buf.getvalue().encode("utf-8"))
 
 
-def make_client(tmp_path):
+def make_client(tmp_path, monkeypatch):
     data_dir = tmp_path
     products_csv = data_dir / "products.csv"
     state_file = data_dir / "state.json"
@@ -32,11 +41,13 @@ def make_client(tmp_path):
             ]
         ],
     )
-    state_file.write_text("{}", encoding="utf-8")
+    state_file.write_bytes(b"{}")
 
-    os.environ["PRODUCTS_CSV"] = str(products_csv)
-    os.environ["STATE_FILE"] = str(state_file)
-    os.environ["HISTORY_DB"] = str(history_db)
+    monkeypatch.setenv("PRODUCTS_CSV", str(products_csv))
+    monkeypatch.setenv("STATE_FILE", str(state_file))
+    monkeypatch.setenv("HISTORY_DB", str(history_db))
+    # Tests check the same product back to back; don't collapse those
+    monkeypatch.setenv("CHECK_CACHE_SECONDS", "0")
 
     # Import lazily to avoid linter import path issues
     from sale_monitor.web.app import create_app
@@ -44,22 +55,20 @@ def make_client(tmp_path):
     return app.test_client()
 
 
-def test_pages_return_200(tmp_path):
-    client = make_client(tmp_path)
-    for path in ("/", "/manage", "/alerts", "/product/detail"):
-        resp = client.get(path)
-        assert resp.status_code == 200
+@pytest.mark.parametrize("path", ["/", "/manage", "/alerts", "/product/detail"])
+def test_pages_return_200(tmp_path, path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    assert client.get(path).status_code == 200
 
 
-def test_products_list_and_add_duplicate(tmp_path):
-    client = make_client(tmp_path)
+def test_products_list_and_add_duplicate(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
 
     # initial list has the seeded product
     r0 = client.get("/api/products")
     assert r0.status_code == 200
     data0 = r0.get_json()
-    urls0 = {p["url"] for p in data0}
-    assert "https://example.com/w" in urls0
+    assert any(p["url"] == "https://example.com/w" for p in data0)
 
     # add a second product
     r1 = client.post(
@@ -87,8 +96,8 @@ def test_products_list_and_add_duplicate(tmp_path):
     assert r2.status_code == 400
 
 
-def test_product_toggle_update_delete(tmp_path):
-    client = make_client(tmp_path)
+def test_product_toggle_update_delete(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
 
     # toggle existing product
     r = client.post("/api/product/toggle", json={"url": "https://example.com/w"})
@@ -136,9 +145,9 @@ def test_product_toggle_update_delete(tmp_path):
     assert dele2.status_code == 404
 
 
-@patch("sale_monitor.services.price_extractor.PriceExtractor.extract_price", return_value=(9.99, 'manual'))
-def test_manual_check_updates_state_and_history(_mock_extract, tmp_path):
-    client = make_client(tmp_path)
+@patch.object(PriceExtractor, "extract_price", return_value=(9.99, 'manual'))
+def test_manual_check_updates_state_and_history(_mock_extract, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
     r = client.post("/api/product/check", json={"url": "https://example.com/w"})
     assert r.status_code == 200
     body = r.get_json()
@@ -148,24 +157,20 @@ def test_manual_check_updates_state_and_history(_mock_extract, tmp_path):
     # Verify history export contains our record
     csv_resp = client.get("/api/export/history")
     assert csv_resp.status_code == 200
-    text = csv_resp.get_data(as_text=True)
-    assert "product_name,product_url,price,timestamp,status" in text
-    assert "https://example.com/w" in text
-    assert ",9.99," in text
+    data = csv_resp.get_data()
+    assert b"product_name,product_url,price,timestamp,status" in data
+    assert b"https://example.com/w" in data
+    assert b",9.99," in data
 
 
-def test_stats_shape_with_history(tmp_path):
-    client = make_client(tmp_path)
+def test_stats_shape_with_history(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
     # Populate history by mocking two manual checks
-    with patch(
-        "sale_monitor.services.price_extractor.PriceExtractor.extract_price",
-        return_value=(10.0, 'manual'),
+    with patch.object(
+        PriceExtractor, "extract_price",
+        side_effect=[(10.0, 'manual'), (8.0, 'manual')],
     ):
         client.post("/api/product/check", json={"url": "https://example.com/w"})
-    with patch(
-        "sale_monitor.services.price_extractor.PriceExtractor.extract_price",
-        return_value=(8.0, 'manual'),
-    ):
         client.post("/api/product/check", json={"url": "https://example.com/w"})
 
     r = client.get("/api/product/stats", query_string={"url": "https://example.com/w"})
@@ -181,9 +186,9 @@ def test_stats_shape_with_history(tmp_path):
     assert stats["min_price"] <= stats["max_price"]
 
 
-def test_alerts_target_met(tmp_path):
+def test_alerts_target_met(tmp_path, monkeypatch):
     # Prepare client and then write state to simulate a target met alert
-    client = make_client(tmp_path)
+    client = make_client(tmp_path, monkeypatch)
 
     # Lower the target price for Widget by updating product
     upd = client.post(
@@ -196,11 +201,10 @@ def test_alerts_target_met(tmp_path):
     assert upd.status_code == 200
 
     # Write state: current_price below target
-    state_path = os.environ["STATE_FILE"]
-    with open(state_path, "w", encoding="utf-8") as f:
-        f.write(
-            '{"https://example.com/w": {"current_price": 9.0, "last_checked": "2024-01-01T00:00:00", "last_price": 10.0}}'
-        )
+    save_state(
+        os.environ["STATE_FILE"],
+        {"https://example.com/w": {"current_price": 9.0, "last_checked": "2024-01-01T00:00:00", "last_price": 10.0}},
+    )
 
     r = client.get("/api/alerts")
     assert r.status_code == 200
@@ -208,9 +212,9 @@ def test_alerts_target_met(tmp_path):
     assert any(a["url"] == "https://example.com/w" and a["alert_type"] == "target_met" for a in alerts)
 
 
-@patch("sale_monitor.services.price_extractor.PriceExtractor.extract_price", return_value=(11.11, 'manual'))
-def test_history_all_endpoint(_mock_extract, tmp_path):
-    client = make_client(tmp_path)
+@patch.object(PriceExtractor, "extract_price", return_value=(11.11, 'manual'))
+def test_history_all_endpoint(_mock_extract, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
     # create one history point
     client.post("/api/product/check", json={"url": "https://example.com/w"})
 
@@ -221,9 +225,9 @@ def test_history_all_endpoint(_mock_extract, tmp_path):
     assert any(item["url"] == "https://example.com/w" and len(item.get("series", [])) >= 1 for item in body)
 
 
-@patch("sale_monitor.services.price_extractor.PriceExtractor.extract_price", return_value=(5.55, 'manual'))
-def test_history_all_deduplicates_by_url(_mock_extract, tmp_path):
-    client = make_client(tmp_path)
+@patch.object(PriceExtractor, "extract_price", return_value=(5.55, 'manual'))
+def test_history_all_deduplicates_by_url(_mock_extract, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
     url = "https://example.com/w"
     # first record with initial name
     client.post("/api/product/check", json={"url": url})
@@ -260,3 +264,245 @@ def test_price_history_normalize_names(tmp_path):
     # Verify
     products = ph.get_all_products()
     assert any(u == url and n == "Correct Name" for u, n in products)
+
+
+def test_history_endpoints_share_one_price_history(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    shared = client.application.extensions["price_history"]
+
+    with patch("sale_monitor.web.app.PriceHistory") as ctor, \
+            patch.object(shared, "get_history_buckets", wraps=shared.get_history_buckets) as get_buckets:
+        r1 = client.get("/api/product/history", query_string={"url": "https://example.com/w"})
+        r2 = client.get("/api/product/stats", query_string={"url": "https://example.com/w"})
+
+    assert r1.status_code == 200 and r2.status_code == 200
+    ctor.assert_not_called()
+    get_buckets.assert_called_once()
+
+
+def test_json_responses_encoded_with_orjson(tmp_path, monkeypatch):
+    from datetime import date
+    from sale_monitor.web.json_provider import ORJSONProvider
+
+    client = make_client(tmp_path, monkeypatch)
+    assert isinstance(client.application.json, ORJSONProvider)
+
+    with client.application.app_context():
+        body = client.application.json.dumps({"b": 1, 2: "x", "when": date(2024, 1, 2)})
+    assert body == '{"2":"x","b":1,"when":"Tue, 02 Jan 2024 00:00:00 GMT"}'
+
+
+@patch.object(PriceExtractor, "extract_price", return_value=(7.5, 'manual'))
+def test_product_history_is_columnar(_mock_extract, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    url = "https://example.com/w"
+
+    empty = client.get("/api/product/history", query_string={"url": url, "bucket": "raw"}).get_json()
+    assert empty == {"timestamp": [], "price": [], "status": []}
+
+    client.post("/api/product/check", json={"url": url})
+    client.post("/api/product/check", json={"url": url})
+    body = client.get("/api/product/history", query_string={"url": url, "bucket": "raw"}).get_json()
+
+    assert body["price"] == [7.5, 7.5]
+    assert body["status"] == ["success", "success"]
+    assert len(body["timestamp"]) == 2
+
+    # Default picks a bucket size that keeps the chart small
+    daily = client.get("/api/product/history", query_string={"url": url, "days": 30}).get_json()
+    assert daily["price"] == [7.5]
+    assert daily["timestamp"][0].endswith("T00:00:00+00:00")
+
+
+def test_product_history_rejects_unknown_bucket(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+
+    r = client.get("/api/product/history", query_string={"url": "https://example.com/w", "bucket": "week"})
+
+    assert r.status_code == 400
+    assert "bucket" in r.get_json()["error"]
+
+
+@patch.object(PriceExtractor, "extract_price", return_value=(7.5, 'manual'))
+def test_sqlite_state_store_created_once(_mock_extract, tmp_path, monkeypatch):
+    from sale_monitor.storage.sqlite_state import SQLiteStateStore
+
+    monkeypatch.setenv("STATE_BACKEND", "sqlite")
+    with patch("sale_monitor.web.app.SQLiteStateStore", wraps=SQLiteStateStore) as ctor:
+        client = make_client(tmp_path, monkeypatch)
+        client.post("/api/product/check", json={"url": "https://example.com/w"})
+        products = client.get("/api/products").get_json()
+
+    assert ctor.call_count == 1
+    assert products[0]["current_price"] == 7.5
+
+
+@patch.object(PriceExtractor, "extract_price", return_value=(7.5, 'manual'))
+def test_manual_check_appends_to_state_log(_mock_extract, tmp_path, monkeypatch):
+    from sale_monitor.storage.json_state import load_state
+
+    client = make_client(tmp_path, monkeypatch)
+    url = "https://example.com/w"
+    client.post("/api/product/check", json={"url": url})
+    client.post("/api/product/check", json={"url": url})
+
+    # Snapshot left alone; each check is one appended log record
+    assert (tmp_path / "state.json").read_text(encoding="utf-8") == "{}"
+    assert load_state(str(tmp_path / "state.json"))[url]["current_price"] == 7.5
+    assert client.get("/api/products").get_json()[0]["current_price"] == 7.5
+
+
+@patch.object(PriceExtractor, "extract_prices_bulk", return_value=[(None, "")])
+def test_unchanged_products_not_rewritten(_mock_bulk, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+
+    with patch("sale_monitor.web.app._write_products_csv") as write:
+        r1 = client.post("/api/products/auto-detect-all")
+        r2 = client.post("/api/product/update", json={"url": "https://example.com/w", "name": "Widget"})
+
+    assert r1.get_json()["failed"] == 1
+    assert r2.get_json()["success"] is True
+    write.assert_not_called()
+
+
+def test_products_and_alerts_support_etag(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+
+    for path in ("/api/products", "/api/alerts"):
+        first = client.get(path)
+        assert first.status_code == 200 and first.headers["ETag"]
+
+        again = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+        assert again.status_code == 304
+        assert again.data == b""
+
+
+def test_check_all_records_enabled_products_in_one_batch(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    write_products_csv(tmp_path / "products.csv", [
+        ["Widget", "https://example.com/w", "", "", "#price", "true", 24],
+        ["Gadget", "https://example.com/g", "", "", "#price", "true", 24],
+        ["Off", "https://example.com/off", "", "", "#price", "false", 24],
+    ])
+    prices = {"https://example.com/w": (5.0, 'manual'), "https://example.com/g": (None, "")}
+
+    with patch.object(PriceExtractor, "extract_price",
+                      side_effect=lambda url, selector: prices[url]):
+        r = client.post("/api/products/check_all")
+
+    body = r.get_json()
+    assert r.status_code == 200
+    assert body["successful"] == 1 and body["failed"] == 1
+    assert body["prices"] == {"https://example.com/w": 5.0}
+
+    products = {p["url"]: p for p in client.get("/api/products").get_json()}
+    assert products["https://example.com/w"]["current_price"] == 5.0
+    assert products["https://example.com/g"]["current_price"] is None
+    history = client.get("/api/product/history",
+                         query_string={"url": "https://example.com/w", "bucket": "raw"}).get_json()
+    assert history["price"] == [5.0]
+
+
+@patch.object(PriceExtractor, "extract_price", return_value=(7.5, 'manual'))
+def test_checks_reuse_one_price_extractor(_mock_extract, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+
+    with patch("sale_monitor.web.app.PriceExtractor") as ctor:
+        client.post("/api/product/check", json={"url": "https://example.com/w"})
+        client.post("/api/products/check_all")
+
+    ctor.assert_not_called()
+    assert _mock_extract.call_count == 2
+
+
+def test_products_csv_replaced_atomically(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    csv_path = tmp_path / "products.csv"
+    before = os.stat(csv_path).st_ino
+
+    r = client.post("/api/product/toggle", json={"url": "https://example.com/w"})
+
+    assert r.get_json()["enabled"] is False
+    assert os.stat(csv_path).st_ino != before
+    assert not list(tmp_path.glob("*.tmp"))
+    assert "false" in csv_path.read_text(encoding="utf-8")
+
+
+def test_manual_check_tracks_last_price(tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    url = "https://example.com/w"
+
+    with patch.object(PriceExtractor, "extract_price", return_value=(7.5, 'manual')):
+        client.post("/api/product/check", json={"url": url})
+    first = client.get("/api/products").get_json()[0]
+    with patch.object(PriceExtractor, "extract_price", return_value=(6.0, 'manual')):
+        client.post("/api/product/check", json={"url": url})
+    second = client.get("/api/products").get_json()[0]
+
+    assert (first["current_price"], first["last_price"]) == (7.5, 7.5)
+    assert (second["current_price"], second["last_price"]) == (6.0, 7.5)
+
+
+@patch.object(PriceExtractor, "extract_price", return_value=(7.5, 'manual'))
+def test_history_export_snapshot_reused_until_history_changes(_mock_extract, tmp_path, monkeypatch):
+    client = make_client(tmp_path, monkeypatch)
+    history = client.application.extensions["price_history"]
+    client.post("/api/product/check", json={"url": "https://example.com/w"})
+
+    with patch.object(history, "export_to_csv", wraps=history.export_to_csv) as export:
+        first = client.get("/api/export/history").get_data(as_text=True)
+        second = client.get("/api/export/history").get_data(as_text=True)
+        assert export.call_count == 1
+
+        client.post("/api/product/check", json={"url": "https://example.com/w"})
+        third = client.get("/api/export/history").get_data(as_text=True)
+        assert export.call_count == 2
+
+    assert first == second
+    assert first.count(",7.5,") == 1 and third.count(",7.5,") == 2
+
+    # Rename by another process (e.g. db_cleanup), with no new row
+    other = sqlite3.connect(os.environ["HISTORY_DB"])
+    with other:
+        other.execute("UPDATE price_history SET product_name = 'Renamed'")
+    other.close()
+    assert "Renamed," in client.get("/api/export/history").get_data(as_text=True)
+
+
+def test_repeated_manual_checks_share_one_fetch(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    client = make_client(tmp_path, monkeypatch)
+    client.application.config["CHECK_CACHE_SECONDS"] = 10
+    url = "https://example.com/w"
+    release = threading.Event()
+
+    def slow_extract(*_args):
+        release.wait(5)
+        return 7.5, 'manual'
+
+    with patch.object(PriceExtractor, "extract_price",
+                      side_effect=slow_extract) as extract:
+        responses = []
+        threads = [
+            threading.Thread(target=lambda: responses.append(
+                client.application.test_client().post("/api/product/check", json={"url": url}).get_json()))
+            for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        while not extract.called:
+            time.sleep(0.001)
+        release.set()
+        for t in threads:
+            t.join()
+        # Within the TTL, a later click reuses the result too
+        later = client.post("/api/product/check", json={"url": url}).get_json()
+
+    assert extract.call_count == 1
+    assert [r["price"] for r in responses] == [7.5, 7.5, 7.5]
+    assert sum(bool(r.get("cached")) for r in responses) == 2
+    assert later["cached"] is True
+    history = client.get("/api/product/history", query_string={"url": url, "bucket": "raw"}).get_json()
+    assert history["price"] == [7.5]